@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from itertools import islice
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+
+STREAM_BATCH_SIZE = 64
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_ORM_THREADS, thread_name_prefix='orm'
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            executor,
+            partial(context.run, run_view, view, request, *args, **kwargs)
+        )
+    return wrapper
+
+
+class StreamingASGIHandler(ASGIHandler):
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        async with ThreadSensitiveContext():
+            try:
+                await send({
+                    'type': 'http.response.start',
+                    'status': response.status_code,
+                    'headers': self.get_response_headers(response),
+                })
+                parts = iter(response)
+                read = sync_to_async(
+                    lambda: list(islice(parts, STREAM_BATCH_SIZE))
+                )
+                while True:
+                    batch = await read()
+                    if not batch:
+                        break
+                    for chunk, _ in self.chunk_bytes(b''.join(batch)):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+                await send({'type': 'http.response.body'})
+            finally:
+                await sync_to_async(response.close)()
+
+    @staticmethod
+    def get_response_headers(response):
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+        return headers
@@ -0,0 +1,60 @@
+from hashlib import sha256
+
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+def get_cache_key(key):
+    return 'token:' + sha256(key.encode()).hexdigest()
+
+
+def invalidate(keys):
+    caches['tokens'].delete_many([get_cache_key(key) for key in keys])
+
+
+class TokenSnapshot:
+    excluded_fields = ('password', 'last_login', 'date_joined')
+
+    def __init__(self, user, token):
+        self.db = user._state.db
+        self.user_model = type(user)
+        excluded_fields = (
+            *self.excluded_fields,
+            *getattr(self.user_model, 'derived_fields', ()),
+        )
+        self.user_fields = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.name not in excluded_fields
+        ]
+        self.user_values = [
+            getattr(user, name) for name in self.user_fields
+        ]
+        self.token_model = type(token)
+        self.token_fields = [
+            field.attname for field in self.token_model._meta.concrete_fields
+        ]
+        self.token_values = [
+            getattr(token, name) for name in self.token_fields
+        ]
+
+    def restore(self):
+        user = self.user_model.from_db(
+            self.db, self.user_fields, list(self.user_values)
+        )
+        token = self.token_model.from_db(
+            self.db, self.token_fields, list(self.token_values)
+        )
+        token.user = user
+        return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = caches['tokens']
+        cache_key = get_cache_key(key)
+        snapshot = cache.get(cache_key)
+        if snapshot is not None:
+            return snapshot.restore()
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, TokenSnapshot(user, token))
+        return user, token
@@ -0,0 +1,63 @@
+import threading
+import time
+from bisect import bisect_left
+from operator import itemgetter
+
+from django.conf import settings
+
+from api.serializers import IngredientSerializer
+from recipes import catalog
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def invalidate(self):
+        self._state = None
+
+    def search(self, prefix, request=None):
+        keys, items, everything = self._get_state(request)
+        if not prefix:
+            return everything
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), start)
+        return sorted(items[start:end], key=itemgetter('id'))
+
+    def _get_state(self, request=None):
+        version, _ = catalog.get_versions(request).get(
+            catalog.INGREDIENTS, (0, None)
+        )
+        state = self._state
+        if state is None or not self._is_fresh(state, version):
+            with self._lock:
+                state = self._state
+                if state is None or not self._is_fresh(state, version):
+                    state = self._build(version)
+                    self._state = state
+        return state[2:]
+
+    def _is_fresh(self, state, version):
+        built_at, built_version = state[:2]
+        return (
+            built_version == version
+            and time.monotonic() - built_at < settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _build(self, version):
+        everything = [
+            dict(item) for item in IngredientSerializer(
+                Ingredient.objects.order_by('pk'), many=True
+            ).data
+        ]
+        by_name = sorted(
+            everything, key=lambda item: item['name'].casefold()
+        )
+        keys = [item['name'].casefold() for item in by_name]
+        return time.monotonic(), version, keys, by_name, everything
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,68 @@
+from hashlib import md5
+
+from django.db.models import Exists, OuterRef
+
+from recipes import catalog
+from recipes.models import Recipe
+from users.models import CustomUser
+
+AUTHOR_FIELDS = (
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+    'author__avatar_variants',
+)
+COUNTER_FIELDS = (
+    'favorites_count',
+    'carts_count',
+    'author__recipes_count',
+    'author__followers_count',
+)
+
+
+def make_etag(*parts):
+    return md5(repr(parts).encode()).hexdigest()
+
+
+def catalog_etag(name):
+    def etag_func(request, *args, **kwargs):
+        version, _ = catalog.get_versions(request).get(name, (0, None))
+        return f'{name}-{version}'
+    return etag_func
+
+
+def catalog_last_modified(name):
+    def last_modified_func(request, *args, **kwargs):
+        _, updated_at = catalog.get_versions(request).get(
+            name, (0, None)
+        )
+        return updated_at
+    return last_modified_func
+
+
+def recipe_etag(request, pk=None, *args, **kwargs):
+    user = request.user
+    queryset = Recipe.objects.all()
+    flags = ()
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            favorited=Exists(CustomUser.fav.through.objects.filter(
+                customuser=user, recipe=OuterRef('pk'))),
+            in_cart=Exists(CustomUser.cart.through.objects.filter(
+                customuser=user, recipe=OuterRef('pk'))),
+            subscribed=Exists(CustomUser.subs.through.objects.filter(
+                from_customuser=user, to_customuser=OuterRef('author'))),
+        )
+        flags = ('favorited', 'in_cart', 'subscribed')
+    try:
+        row = queryset.values_list(
+            'updated_at', 'image_variants',
+            *AUTHOR_FIELDS, *COUNTER_FIELDS, *flags
+        ).get(pk=pk)
+    except (Recipe.DoesNotExist, ValueError):
+        return None
+    return make_etag(
+        user.pk, row, sorted(catalog.get_versions(request).items())
+    )
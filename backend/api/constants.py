@@ -1 +1,3 @@
 NAME_MAX_LENGTH = 150
+
+BULK_MAX_SIZE = 100
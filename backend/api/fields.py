@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from recipes import images
+
+
+class ImageVariantField(serializers.Field):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, file):
+        if not file:
+            return None
+        url = images.get_variant_url(file, self.variant)
+        if url is None:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,6 +1,9 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Recipe
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from users.models import CustomUser
 
 
 class RecipeFilterSet(filters.FilterSet):
@@ -14,23 +17,44 @@ class RecipeFilterSet(filters.FilterSet):
     tags = filters.CharFilter(
         method='filter_by_tags'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author', 'tags']
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'search'
+        ]
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(fav_by=user)
+            return queryset.filter(Exists(
+                CustomUser.fav.through.objects.filter(
+                    customuser=user, recipe=OuterRef('pk'))
+            ))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(in_cart_of=user)
+            return queryset.filter(Exists(
+                CustomUser.cart.through.objects.filter(
+                    customuser=user, recipe=OuterRef('pk'))
+            ))
         return queryset
 
     def filter_by_tags(self, queryset, name, value):
         tags = self.request.GET.getlist('tags')
-        return queryset.filter(tags__slug__in=tags).distinct()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag__in=Tag.objects.filter(slug__in=tags))
+        ))
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
@@ -0,0 +1,82 @@
+from django.core.cache import caches
+from django.db.models import Prefetch, prefetch_related_objects
+
+from api.conditional import make_etag
+from recipes import catalog
+from recipes.models import RecipeIngredients
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+VIEWER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+COUNTER_FIELDS = ('favorites_count', 'carts_count')
+AUTHOR_COUNTER_FIELDS = ('recipes_count', 'followers_count')
+
+
+def get_prefetches():
+    return (
+        'tags',
+        Prefetch(
+            'recipeingredients',
+            queryset=RecipeIngredients.objects.select_related('ingredient')
+        ),
+    )
+
+
+def get_key(recipe, context):
+    request = context['request']
+    author = recipe.author
+    return 'recipe:' + make_etag(
+        recipe.pk,
+        recipe.updated_at,
+        [str(getattr(author, field)) for field in AUTHOR_FIELDS],
+        sorted(recipe.image_variants.items()),
+        sorted(author.avatar_variants.items()),
+        sorted(
+            (name, version)
+            for name, (version, _) in catalog.get_versions(request).items()
+        ),
+        request.scheme,
+        request.get_host(),
+    )
+
+
+def overlay(serializer, fragment, recipe):
+    fragment = dict(fragment)
+    for field in VIEWER_FIELDS:
+        fragment[field] = getattr(serializer, f'get_{field}')(recipe)
+    for field in COUNTER_FIELDS:
+        fragment[field] = getattr(recipe, field)
+    author = dict(fragment['author'])
+    author['is_subscribed'] = serializer.fields['author'].get_is_subscribed(
+        recipe.author
+    )
+    for field in AUTHOR_COUNTER_FIELDS:
+        author[field] = getattr(recipe.author, field)
+    fragment['author'] = author
+    return fragment
+
+
+def to_representation(serializer, recipes):
+    cache = caches['fragments']
+    keys = {
+        recipe.pk: get_key(recipe, serializer.context) for recipe in recipes
+    }
+    fragments = cache.get_many(set(keys.values()))
+    missing = [
+        recipe for recipe in recipes if keys[recipe.pk] not in fragments
+    ]
+    if missing:
+        prefetch_related_objects(missing, *get_prefetches())
+        fresh = {
+            keys[recipe.pk]: serializer.to_representation(recipe)
+            for recipe in missing
+        }
+        cache.set_many(fresh)
+        fragments.update(fresh)
+    return [
+        overlay(serializer, fragments[keys[recipe.pk]], recipe)
+        for recipe in recipes
+    ]
+
+
+def get_representation(serializer, recipe):
+    return to_representation(serializer, [recipe])[0]
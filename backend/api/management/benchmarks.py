@@ -0,0 +1,19 @@
+import statistics
+
+from api import plans
+
+
+def measure(queryset, limit, repeat):
+    sql, params = queryset[:limit].query.sql_with_params()
+    results = [
+        plans.explain(sql, params, analyze=True) for _ in range(repeat + 1)
+    ][1:]
+    return {
+        'planning_ms': statistics.median(
+            result['Planning Time'] for result in results
+        ),
+        'execution_ms': statistics.median(
+            result['Execution Time'] for result in results
+        ),
+        'plan': results[0],
+    }
@@ -0,0 +1,317 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import fake_data
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+SCENARIOS = {
+    'browse_by_tags': 40,
+    'recipe_detail': 15,
+    'ingredient_autocomplete': 20,
+    'toggle_favorite': 10,
+    'download_shopping_cart': 5,
+    'subscriptions': 10,
+}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0,
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = percentile(latencies, percent) * 1000
+    return summary
+
+
+class Plan:
+    def __init__(self, random_seed, users):
+        self.random = random.Random(random_seed)
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        self.prefixes = sorted({
+            name[:2] for name in Ingredient.objects.values_list(
+                'name', flat=True
+            ) if len(name) >= 2
+        })
+        users = list(fake_data.get_users().order_by('pk')[:users])
+        self.tokens = fake_data.get_tokens(users)
+        self.favorites = set(
+            CustomUser.fav.through.objects.filter(
+                customuser__in=users
+            ).values_list('customuser_id', 'recipe_id')
+        )
+        self.user_ids = [user.pk for user in users]
+        self.toggled = set()
+        if not (self.tags and self.recipe_ids and self.prefixes):
+            raise CommandError(
+                'Нет данных для нагрузки: запустите команду с --seed.'
+            )
+        if not self.tokens:
+            raise CommandError(
+                'Нет тестовых пользователей: запустите команду с --seed.'
+            )
+
+    def token(self):
+        index = self.random.randrange(len(self.tokens))
+        return index, self.tokens[index]
+
+    def browse_by_tags(self):
+        tags = self.random.sample(
+            self.tags, self.random.randint(1, min(2, len(self.tags)))
+        )
+        query = '&'.join(f'tags={tag}' for tag in tags)
+        page = self.random.randint(1, 5)
+        return None, [(
+            'GET /api/recipes/?tags', 'get',
+            f'/api/recipes/?{query}&page={page}&limit=6'
+        )]
+
+    def recipe_detail(self):
+        _, token = self.token()
+        recipe_id = self.random.choice(self.recipe_ids)
+        return token, [
+            ('GET /api/recipes/{id}/', 'get', f'/api/recipes/{recipe_id}/')
+        ]
+
+    def ingredient_autocomplete(self):
+        prefix = self.random.choice(self.prefixes)
+        return None, [(
+            'GET /api/ingredients/?name', 'get',
+            f'/api/ingredients/?name={prefix}'
+        )]
+
+    def toggle_favorite(self):
+        for _ in range(10):
+            index, token = self.token()
+            pair = (self.user_ids[index], self.random.choice(self.recipe_ids))
+            if pair not in self.toggled:
+                break
+        self.toggled.add(pair)
+        path = f'/api/recipes/{pair[1]}/favorite/'
+        steps = [
+            ('POST /api/recipes/{id}/favorite/', 'post', path),
+            ('DELETE /api/recipes/{id}/favorite/', 'delete', path),
+        ]
+        if pair in self.favorites:
+            steps.reverse()
+        return token, steps
+
+    def download_shopping_cart(self):
+        _, token = self.token()
+        return token, [(
+            'GET /api/recipes/download_shopping_cart/', 'get',
+            '/api/recipes/download_shopping_cart/'
+        )]
+
+    def subscriptions(self):
+        _, token = self.token()
+        return token, [(
+            'GET /api/users/subscriptions/', 'get',
+            '/api/users/subscriptions/?recipes_limit=3'
+        )]
+
+    def build(self, weights, total):
+        names = [name for name, weight in weights.items() if weight > 0]
+        chosen = self.random.choices(
+            names, weights=[weights[name] for name in names], k=total
+        )
+        return [getattr(self, name)() for name in chosen]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает API сценариями из Postman-коллекции и сравнивает '
+        'пропускную способность и задержки по эндпоинтам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='Имя и адрес сервера: wsgi=http://127.0.0.1:8000',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            default=[],
+            help='Вес сценария: browse_by_tags=40. Вес 0 отключает сценарий.',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Количество запусков сценариев.',
+        )
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Количество тестовых пользователей, от имени которых '
+                 'выполняются запросы.',
+        )
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Создать тестовых пользователей и рецепты перед запуском.',
+        )
+        parser.add_argument('--seed-users', type=int, default=100)
+        parser.add_argument('--seed-recipes', type=int, default=5000)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--baseline',
+            help='JSON с результатами прошлого запуска для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        weights = dict(SCENARIOS)
+        for scenario in options['scenario']:
+            name, _, weight = scenario.partition('=')
+            if name not in SCENARIOS or not weight.isdigit():
+                raise CommandError(f'Неверный сценарий: {scenario}')
+            weights[name] = int(weight)
+
+        if options['seed'] and not fake_data.get_users().exists():
+            dataset = fake_data.Dataset(
+                options['seed_users'],
+                options['seed_recipes'],
+                random_seed=options['random_seed'],
+            )
+            try:
+                for _ in fake_data.generate(dataset):
+                    pass
+            except ValueError as error:
+                raise CommandError(error)
+            self.stdout.write(
+                f'Тестовые данные: пользователей {dataset.users}, '
+                f'рецептов {dataset.recipes}.'
+            )
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['targets']
+
+        results = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'config': {
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'random_seed': options['random_seed'],
+                'scenarios': weights,
+            },
+            'targets': {},
+        }
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f'Неверный формат --target: {target}')
+            plan = Plan(options['random_seed'], options['users']).build(
+                weights, options['requests']
+            )
+            result = self.run(url.rstrip('/'), plan, options['concurrency'])
+            results['targets'][name] = result
+            self.report(name, result, baseline.get(name))
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}.')
+
+    def run(self, url, plan, concurrency):
+        local = threading.local()
+
+        def execute(task):
+            token, steps = task
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            headers = {'Authorization': f'Token {token}'} if token else {}
+            measurements = []
+            for endpoint, method, path in steps:
+                started = time.perf_counter()
+                try:
+                    response = local.session.request(
+                        method, url + path, headers=headers
+                    )
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                measurements.append(
+                    (endpoint, time.perf_counter() - started, failed)
+                )
+            return measurements
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            measurements = [
+                measurement
+                for task_measurements in executor.map(execute, plan)
+                for measurement in task_measurements
+            ]
+        elapsed = time.perf_counter() - started
+
+        endpoints = {}
+        for endpoint, latency, failed in measurements:
+            latencies, errors = endpoints.setdefault(endpoint, ([], [0]))
+            latencies.append(latency)
+            errors[0] += failed
+        return {
+            'elapsed_seconds': elapsed,
+            'total': summarize(
+                [latency for _, latency, _ in measurements],
+                sum(failed for _, _, failed in measurements),
+                elapsed
+            ),
+            'endpoints': {
+                endpoint: summarize(latencies, errors[0], elapsed)
+                for endpoint, (latencies, errors) in sorted(endpoints.items())
+            },
+        }
+
+    def report(self, name, result, baseline):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Сервер {name}'))
+        self.stdout.write(
+            f'{"эндпоинт":<42}{"запросы":>9}{"RPS":>9}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}{"ошибки":>8}'
+        )
+        rows = [*result['endpoints'].items(), ('всего', result['total'])]
+        for endpoint, summary in rows:
+            line = (
+                f'{endpoint:<42}{summary["requests"]:>9}'
+                f'{summary["rps"]:>9.1f}{summary["p50_ms"]:>10.1f}'
+                f'{summary["p95_ms"]:>10.1f}{summary["p99_ms"]:>10.1f}'
+                f'{summary["errors"]:>8}'
+            )
+            previous = None
+            if baseline:
+                previous = (
+                    baseline['total'] if endpoint == 'всего'
+                    else baseline['endpoints'].get(endpoint)
+                )
+            if previous and previous['p95_ms']:
+                change = summary['p95_ms'] / previous['p95_ms'] - 1
+                line += f'  p95 {change:+.0%}'
+            self.stdout.write(line)
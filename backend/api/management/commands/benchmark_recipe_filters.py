@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory
+
+from api import plans
+from api.filtersets import RecipeFilterSet
+from api.management.benchmarks import measure
+from api.views import RecipeViewSet
+from recipes.models import Tag
+from users.models import CustomUser
+
+SCENARIOS = {
+    'tags': {},
+    'tags_favorited': {'is_favorited': 1},
+    'tags_cart': {'is_in_shopping_cart': 1},
+}
+
+
+def get_queryset(user, tags, filters, legacy):
+    request = APIRequestFactory().get('/api/recipes/', {'tags': tags})
+    request.user = user
+    view = RecipeViewSet(request=request, action='list', format_kwarg=None)
+    queryset = view.get_queryset()
+    if not legacy:
+        return RecipeFilterSet(
+            {'tags': tags, **filters}, queryset, request=request
+        ).qs
+    queryset = queryset.filter(tags__slug__in=tags)
+    if filters.get('is_favorited'):
+        queryset = queryset.filter(fav_by=user)
+    if filters.get('is_in_shopping_cart'):
+        queryset = queryset.filter(in_cart_of=user)
+    return queryset.distinct()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы фильтрации рецептов по тегам, избранному и '
+        'списку покупок: прежние JOIN с DISTINCT и подзапросы EXISTS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Имя пользователя. По умолчанию — с самым большим '
+                 'избранным.',
+        )
+        parser.add_argument(
+            '--tag',
+            action='append',
+            help='Слаг тега. По умолчанию — все теги.',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Планы сравниваются только на PostgreSQL.')
+        if options['user']:
+            user = CustomUser.objects.filter(
+                username=options['user']
+            ).first()
+        else:
+            user = CustomUser.objects.annotate(
+                fav_size=Count('fav')
+            ).order_by('-fav_size').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        tags = options['tag'] or list(
+            Tag.objects.values_list('slug', flat=True)
+        )
+
+        self.stdout.write(
+            f'Пользователь {user.username}, теги: {", ".join(tags)}.'
+        )
+        self.stdout.write(
+            f'{"сценарий":<16}{"версия":<9}{"план, мс":>10}'
+            f'{"выполнение, мс":>16}  сортировки строки'
+        )
+        for name, filters in SCENARIOS.items():
+            for version, legacy in (('JOIN', True), ('EXISTS', False)):
+                result = measure(
+                    get_queryset(user, tags, filters, legacy),
+                    options['limit'],
+                    options['repeat'],
+                )
+                row_nodes = plans.get_row_nodes(result['plan'])
+                self.stdout.write(
+                    f'{name:<16}{version:<9}{result["planning_ms"]:>10.2f}'
+                    f'{result["execution_ms"]:>16.2f}  '
+                    f'{", ".join(row_nodes) or "нет"}'
+                )
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import plans
+from api.management.benchmarks import measure
+from recipes.models import Recipe
+from recipes.search import search_recipes, search_recipes_by_substring
+
+VERSIONS = {
+    'ILIKE': lambda queryset, value: search_recipes_by_substring(
+        queryset, value
+    ).order_by('-pk'),
+    'tsvector': search_recipes,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск рецептов по подстроке (ILIKE) и ранжированный '
+        'полнотекстовый поиск по search_vector.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--query',
+            action='append',
+            help='Поисковый запрос. По умолчанию — «рецепт» и «соль».',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Планы сравниваются только на PostgreSQL.')
+        queries = options['query'] or ['рецепт', 'соль']
+        missing = Recipe.objects.filter(search_vector__isnull=True).count()
+        if missing:
+            self.stderr.write(
+                f'Рецептов без поискового вектора: {missing}. '
+                'Запустите rebuild_search_vectors.'
+            )
+
+        self.stdout.write(
+            f'{"запрос":<16}{"версия":<10}{"план, мс":>10}'
+            f'{"выполнение, мс":>16}  доступ к рецептам'
+        )
+        for value in queries:
+            for version, search in VERSIONS.items():
+                result = measure(
+                    search(Recipe.objects.all(), value),
+                    options['limit'],
+                    options['repeat'],
+                )
+                scans = plans.get_scans(result['plan'], 'recipes_recipe')
+                self.stdout.write(
+                    f'{value:<16}{version:<10}{result["planning_ms"]:>10.2f}'
+                    f'{result["execution_ms"]:>16.2f}  '
+                    f'{", ".join(scans)}'
+                )
@@ -0,0 +1,151 @@
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, Sum
+from django.http import HttpResponse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from users.models import CustomUser
+
+MODES = ('buffered', 'streaming')
+
+
+def buffered_response(request, user):
+    ingredients = (
+        user.cart.all()
+        .values(
+            ingredient_name=F('recipeingredients__ingredient__name'),
+            measurement_unit=F(
+                'recipeingredients__ingredient__measurement_unit')
+        )
+        .annotate(total_amount=Sum('recipeingredients__amount'))
+        .order_by('ingredient_name')
+    )
+    shopping_list_text = '\n'.join(
+        f"{ingredient['ingredient_name']} "
+        f"({ingredient['measurement_unit']}) — "
+        f"{ingredient['total_amount']} {ingredient['measurement_unit']}"
+        for ingredient in ingredients
+    )
+    response = HttpResponse(shopping_list_text, content_type='text/plain')
+    response['Content-Disposition'] = 'attachment; filename="list.txt"'
+    return response
+
+
+def streaming_response(request, user):
+    force_authenticate(request, user=user)
+    return RecipeViewSet.as_view(
+        {'get': 'download_shopping_cart'},
+        **RecipeViewSet.download_shopping_cart.kwargs
+    )(request)
+
+
+RESPONSES = {
+    'buffered': buffered_response,
+    'streaming': streaming_response,
+}
+
+
+def download(mode, user):
+    request = APIRequestFactory().get(
+        '/api/recipes/download_shopping_cart/', {'format': 'txt'}
+    )
+    started = time.perf_counter()
+    response = RESPONSES[mode](request, user)
+    chunks = iter(
+        response.streaming_content if response.streaming
+        else [response.content]
+    )
+    first = next(chunks, b'')
+    first_byte = time.perf_counter() - started
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    return first_byte, time.perf_counter() - started, size
+
+
+def measure(mode, user, repeat):
+    download(mode, user)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = [download(mode, user) for _ in range(repeat)]
+    rss_growth = (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    ) * 1024
+    tracemalloc.start()
+    download(mode, user)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'ttfb_ms': statistics.median(t[0] for t in timings) * 1000,
+        'total_ms': statistics.median(t[1] for t in timings) * 1000,
+        'bytes': timings[0][2],
+        'python_peak_bytes': python_peak,
+        'rss_growth_bytes': rss_growth,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время до первого байта и пиковую память при выгрузке '
+        'списка покупок: прежняя буферизованная и потоковая версии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Имя пользователя. По умолчанию — с самым большим '
+                 'списком покупок.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--mode', choices=MODES, help='Замер в текущем процессе.'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = CustomUser.objects.filter(
+                username=options['user']
+            ).first()
+        else:
+            user = CustomUser.objects.annotate(
+                cart_size=Count('cart')
+            ).order_by('-cart_size').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+
+        if options['mode']:
+            self.stdout.write(json.dumps(
+                measure(options['mode'], user, options['repeat'])
+            ))
+            return
+
+        self.stdout.write(
+            f'Пользователь {user.username}, рецептов в списке покупок: '
+            f'{user.cart.count()}.'
+        )
+        self.stdout.write(
+            f'{"версия":<12}{"TTFB, мс":>10}{"всего, мс":>11}'
+            f'{"размер, Б":>12}{"Python, КБ":>12}{"RSS, КБ":>10}'
+        )
+        for mode in MODES:
+            result = json.loads(subprocess.run(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'),
+                    'benchmark_shopping_list', '--mode', mode,
+                    '--user', user.username,
+                    '--repeat', str(options['repeat']),
+                ],
+                check=True, capture_output=True, text=True
+            ).stdout)
+            self.stdout.write(
+                f'{mode:<12}{result["ttfb_ms"]:>10.1f}'
+                f'{result["total_ms"]:>11.1f}{result["bytes"]:>12}'
+                f'{result["python_peak_bytes"] / 1024:>12.0f}'
+                f'{result["rss_growth_bytes"] / 1024:>10.0f}'
+            )
@@ -1,52 +1,134 @@
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 
-from api.serializers import RelatedRecipeSerializer
+from api import relations
+from api.serializers import BulkIdsSerializer, RelatedRecipeSerializer
+from recipes import catalog
+
+ADDED = 'added'
+REMOVED = 'removed'
+ALREADY_ADDED = 'already_added'
+NOT_ADDED = 'not_added'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+class CatalogCacheMixin:
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_key(self, request):
+        version, _ = catalog.get_versions(request).get(
+            self.catalog_name, (0, None)
+        )
+        return (
+            f'response:{self.catalog_name}:{version}:'
+            f'{request.get_full_path()}'
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        cache = caches['catalog']
+        key = self.get_cache_key(request)
+        content = cache.get(key)
+        if content is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            cache.set(key, content)
+        return HttpResponse(
+            content, content_type=f'{renderer.media_type}; charset=utf-8'
+        )
 
 
 class RecipeActionMixin:
-    def cart_add(self, user, recipe):
-        if self.request.method == 'POST':
-            if user.cart.filter(pk=recipe.pk).exists():
-                return Response(
-                    {'detail': 'Этот рецепт уже в списке покупок.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            user.cart.add(recipe)
-            serializer = RelatedRecipeSerializer(
-                recipe,
-                context={'request': self.request}
+    def change_recipe(self, user, relation, recipe, exists_message,
+                      missing_message):
+        adding = self.request.method == 'POST'
+        if not relations.change(user, relation, recipe.pk, adding):
+            return Response(
+                {'detail': exists_message if adding else missing_message},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        elif self.request.method == 'DELETE':
-            if not user.cart.filter(pk=recipe.pk).exists():
-                return Response(
-                    {'detail': 'Этого рецепта нет в списке покупок.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            user.cart.remove(recipe)
+        if not adding:
             return Response(status=status.HTTP_204_NO_CONTENT)
+        serializer = RelatedRecipeSerializer(
+            recipe,
+            context={'request': self.request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def cart_add(self, user, recipe):
+        return self.change_recipe(
+            user, 'cart', recipe,
+            'Этот рецепт уже в списке покупок.',
+            'Этого рецепта нет в списке покупок.'
+        )
 
     def fav_add(self, user, recipe):
-        if self.request.method == 'POST':
-            if user.fav.filter(pk=recipe.pk).exists():
-                return Response(
-                    {'detail': 'Этот рецепт уже в избранном.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            user.fav.add(recipe)
-            serializer = RelatedRecipeSerializer(
-                recipe,
-                context={'request': self.request}
+        return self.change_recipe(
+            user, 'fav', recipe,
+            'Этот рецепт уже в избранном.',
+            'Этого рецепта нет в избранном.'
+        )
+
+
+class BulkRelationMixin:
+    def change_relation(self, relation, queryset, forbidden=()):
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = self.request.user
+        manager = getattr(user, relation)
+        adding = self.request.method == 'POST'
+
+        with transaction.atomic():
+            relations.lock_user(user)
+            present = dict(
+                queryset.filter(pk__in=ids).annotate(
+                    present=Exists(manager.through.objects.filter(**{
+                        manager.source_field_name: user.pk,
+                        manager.target_field_name: OuterRef('pk'),
+                    }))
+                ).values_list('pk', 'present')
             )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        elif self.request.method == 'DELETE':
-            if not user.fav.filter(pk=recipe.pk).exists():
-                return Response(
-                    {'detail': 'Этого рецепта нет в избранном.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            user.fav.remove(recipe)
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            changed = {
+                pk for pk, is_present in present.items()
+                if is_present != adding and pk not in forbidden
+            }
+            if changed:
+                relations.write(manager, changed, adding)
+
+        results = []
+        for pk in ids:
+            if pk not in present:
+                outcome = NOT_FOUND
+            elif pk in changed:
+                outcome = ADDED if adding else REMOVED
+            elif adding and pk in forbidden:
+                outcome = FORBIDDEN
+            else:
+                outcome = ALREADY_ADDED if adding else NOT_ADDED
+            results.append({'id': pk, 'status': outcome})
+        return Response({'results': results})
@@ -1,5 +1,121 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
+from recipes import feed
 
-class CustomPagination(PageNumberPagination):
+
+def get_limit(request, name, default, minimum=1, maximum=None):
+    value = request.query_params.get(name, '')
+    if value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'Ожидается целое число.'})
+    if value < minimum:
+        raise ValidationError(
+            {name: f'Значение должно быть не меньше {minimum}.'}
+        )
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+class LimitMixin:
+    page_size_query_param = 'limit'
+
+    def get_page_size(self, request):
+        return get_limit(
+            request, self.page_size_query_param, self.page_size,
+            maximum=self.max_page_size
+        )
+
+
+class CustomPagination(LimitMixin, PageNumberPagination):
+    pass
+
+
+class CustomCursorPagination(LimitMixin, CursorPagination):
+    ordering = '-id'
+
+
+class SwitchablePagination(BasePagination):
+    mode_query_param = 'paginate'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.page_number_paginator = CustomPagination()
+        self.cursor_paginator = CustomCursorPagination()
+        self.paginator = self.page_number_paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_paginator.cursor_query_param in request.query_params
+        ):
+            self.paginator = self.cursor_paginator
+            ordering = (
+                queryset.query.order_by or queryset.model._meta.ordering
+            )
+            if ordering:
+                self.cursor_paginator.ordering = tuple(ordering)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_schema_fields(self, view):
+        return (
+            self.page_number_paginator.get_schema_fields(view)
+            + self.cursor_paginator.get_schema_fields(view)[:1]
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.page_number_paginator.get_schema_operation_parameters(view)
+            + self.cursor_paginator.get_schema_operation_parameters(view)[:1]
+        )
+
+
+class FeedPagination(BasePagination):
+    cursor_query_param = 'cursor'
     page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        return get_limit(
+            request, self.page_size_query_param, api_settings.PAGE_SIZE,
+            maximum=self.max_page_size
+        )
+
+    def paginate_feed(self, user, request):
+        self.request = request
+        before = request.query_params.get(self.cursor_query_param)
+        if before is not None:
+            try:
+                before = int(before)
+            except ValueError:
+                raise NotFound('Неверный курсор.')
+        page_size = self.get_page_size(request)
+        recipe_ids = feed.get_recipe_ids(user, page_size, before)
+        self.next_cursor = (
+            recipe_ids[page_size - 1] if len(recipe_ids) > page_size
+            else None
+        )
+        return recipe_ids[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,38 @@
+import json
+
+from django.db import connection
+
+ROW_NODES = ('Sort', 'Incremental Sort', 'Unique', 'Aggregate')
+
+
+def explain(sql, params=(), analyze=False):
+    options = 'ANALYZE, BUFFERS, ' if analyze else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'EXPLAIN ({options}VERBOSE, FORMAT JSON) {sql}', params
+        )
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def get_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from get_nodes(child)
+
+
+def get_row_nodes(plan, column='recipes_recipe.text'):
+    return [
+        node['Node Type'] for node in get_nodes(plan['Plan'])
+        if node['Node Type'] in ROW_NODES
+        and any(output.endswith(column) for output in node.get('Output', ()))
+    ]
+
+
+def get_scans(plan, relation):
+    return [
+        node['Node Type'] for node in get_nodes(plan['Plan'])
+        if node.get('Relation Name') == relation
+    ]
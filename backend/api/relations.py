@@ -0,0 +1,58 @@
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+from users.models import CustomUser
+
+
+def lock_user(user):
+    list(
+        CustomUser.objects.select_for_update()
+        .filter(pk=user.pk).values_list('pk', flat=True)
+    )
+
+
+def write(manager, pks, adding):
+    """Один INSERT ... ON CONFLICT DO NOTHING или один DELETE.
+
+    add()/remove() менеджера перед вставкой заново выбирают уже
+    связанные id; здесь они известны, а сигналы m2m_changed для
+    счётчиков, итогов списка покупок и лент отправляются так же.
+    Вызывать под lock_user(), иначе pk_set может разойтись с тем,
+    что на самом деле записано.
+    """
+    through = manager.through
+    source = f'{manager.source_field_name}_id'
+    target = f'{manager.target_field_name}_id'
+    action = 'add' if adding else 'remove'
+    signal_kwargs = {
+        'sender': through,
+        'instance': manager.instance,
+        'reverse': manager.reverse,
+        'model': manager.model,
+        'pk_set': pks,
+        'using': router.db_for_write(through, instance=manager.instance),
+    }
+    m2m_changed.send(action=f'pre_{action}', **signal_kwargs)
+    if adding:
+        through.objects.bulk_create(
+            [
+                through(**{source: manager.instance.pk, target: pk})
+                for pk in sorted(pks)
+            ],
+            ignore_conflicts=True
+        )
+    else:
+        through.objects.filter(**{
+            source: manager.instance.pk, f'{target}__in': pks
+        }).delete()
+    m2m_changed.send(action=f'post_{action}', **signal_kwargs)
+
+
+def change(user, relation, pk, adding):
+    manager = getattr(user, relation)
+    with transaction.atomic():
+        lock_user(user)
+        if manager.filter(pk=pk).exists() == adding:
+            return False
+        write(manager, {pk}, adding)
+    return True
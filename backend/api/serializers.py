@@ -2,11 +2,15 @@ import re
 
 from django.contrib.auth.password_validation import validate_password
 from django.core.validators import MaxLengthValidator
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from api.constants import NAME_MAX_LENGTH
+from api import fragments, relations
+from api.constants import BULK_MAX_SIZE, NAME_MAX_LENGTH
+from api.fields import ImageVariantField
+from recipes import cart_totals, images, search
 from recipes.constants import MAX_VALUE, MIN_VALUE
 from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
 from users.models import CustomUser
@@ -19,7 +23,11 @@ class IsSubscribedMixin(serializers.Serializer):
         user = self.context['request'].user
         if not user.is_authenticated:
             return False
-        return obj in user.subs.all()
+        if 'subscriptions' not in self.context:
+            self.context['subscriptions'] = set(
+                user.subs.values_list('pk', flat=True)
+            )
+        return obj.pk in self.context['subscriptions']
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -85,6 +93,7 @@ class CustomUserSerializer(serializers.ModelSerializer, IsSubscribedMixin):
         required=True,
         validators=(validate_password,)
     )
+    avatar_thumb = ImageVariantField(images.THUMB, source='avatar')
 
     class Meta:
         model = CustomUser
@@ -97,6 +106,9 @@ class CustomUserSerializer(serializers.ModelSerializer, IsSubscribedMixin):
             'password',
             'is_subscribed',
             'avatar',
+            'avatar_thumb',
+            'recipes_count',
+            'followers_count',
         )
 
     def __init__(self, *args, **kwargs):
@@ -104,7 +116,10 @@ class CustomUserSerializer(serializers.ModelSerializer, IsSubscribedMixin):
         request = self.context.get('request')
         if (request and request.method == 'POST'):
             self.fields.pop('avatar', None)
+            self.fields.pop('avatar_thumb', None)
             self.fields.pop('is_subscribed', None)
+            self.fields.pop('recipes_count', None)
+            self.fields.pop('followers_count', None)
 
     def create(self, validated_data):
         user = CustomUser.objects.create(
@@ -125,10 +140,12 @@ class CustomUserSerializer(serializers.ModelSerializer, IsSubscribedMixin):
 
 
 class SubscriptionSerializer(serializers.Serializer):
+    already_subscribed = 'Вы уже подписаны на данного пользователя.'
+    not_subscribed = 'Вы не подписаны на данного пользователя.'
 
     def validate(self, data):
         user = self.context['request'].user
-        sub = self.context['view'].get_object()
+        sub = self.context['sub']
 
         if self.context['request'].method == 'POST':
             if user.pk == sub.pk:
@@ -137,28 +154,43 @@ class SubscriptionSerializer(serializers.Serializer):
                 )
             if user.subs.filter(pk=sub.pk).exists():
                 raise serializers.ValidationError(
-                    {'detail': 'Вы уже подписаны на данного пользователя.'}
+                    {'detail': self.already_subscribed}
                 )
 
         elif self.context['request'].method == 'DELETE':
             if not user.subs.filter(pk=sub.pk).exists():
                 raise serializers.ValidationError(
-                    {'detail': 'Вы не подписаны на данного пользователя.'}
+                    {'detail': self.not_subscribed}
                 )
 
         return data
 
     def save(self):
-        user = self.context['request'].user
-        sub = self.context['view'].get_object()
+        request = self.context['request']
+        sub = self.context['sub']
+        adding = request.method == 'POST'
+
+        if not relations.change(request.user, 'subs', sub.pk, adding):
+            raise serializers.ValidationError({
+                'detail': (
+                    self.already_subscribed if adding
+                    else self.not_subscribed
+                )
+            })
+        return sub if adding else None
 
-        if self.context['request'].method == 'POST':
-            user.subs.add(sub)
-            return sub
 
-        elif self.context['request'].method == 'DELETE':
-            user.subs.remove(sub)
-            return None
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_SIZE
+    )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return fragments.to_representation(self.child, list(data))
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -177,6 +209,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(
         required=True,
     )
+    image_webp = ImageVariantField(images.WEBP, source='image')
+    image_thumb = ImageVariantField(images.THUMB, source='image')
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -189,9 +223,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients',
-            'is_favorited', 'is_in_shopping_cart', 'image',
-            'name', 'text', 'cooking_time'
+            'is_favorited', 'is_in_shopping_cart', 'image', 'image_webp',
+            'image_thumb', 'name', 'text', 'cooking_time', 'favorites_count',
+            'carts_count'
         )
+        list_serializer_class = RecipeListSerializer
 
     def validate_ingredients(self, data):
         ingredient_ids = [
@@ -240,26 +276,47 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         recipe.tags.set(tags_data)
         self.ingredients_create(ingredients_data, recipe)
+        search.update_vectors([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.ingredients.clear()
-        ingredients_data = validated_data.pop('recipeingredients')
-        self.ingredients_create(ingredients_data, instance)
-
-        instance.tags.clear()
-        tags_data = validated_data.pop('tags')
-        instance.tags.set(tags_data)
-
-        return super().update(instance, validated_data)
+        list(
+            Recipe.objects.select_for_update()
+            .filter(pk=instance.pk).values_list('pk', flat=True)
+        )
+        ingredients_changed = self.ingredients_update(
+            validated_data.pop('recipeingredients'), instance
+        )
+        tags_changed = self.tags_update(validated_data.pop('tags'), instance)
+        if images.is_same_content(
+            instance.image, validated_data.get('image')
+        ):
+            validated_data.pop('image')
+
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields or ingredients_changed or tags_changed:
+            instance.save(update_fields=[*changed_fields, 'updated_at'])
+        if ingredients_changed or {'name', 'text'} & set(changed_fields):
+            search.update_vectors([instance.pk])
+        return instance
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return user.fav.filter(id=obj.id).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return user.cart.filter(id=obj.id).exists()
@@ -268,7 +325,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['tags'] = TagSerializer(
-            instance.tags, many=True).data
+            instance.tags.all(), many=True).data
         return representation
 
     def ingredients_create(self, ingredients_data, recipe):
@@ -282,17 +339,78 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
         RecipeIngredients.objects.bulk_create(recipe_ingredients)
 
+    def ingredients_update(self, ingredients_data, recipe):
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient
+            in RecipeIngredients.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in existing.items()
+        }
+        new_amounts = {
+            ingredient_obj['ingredient'].id: ingredient_obj['amount']
+            for ingredient_obj in ingredients_data
+        }
+        changes = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        if not any(changes.values()):
+            return False
+
+        to_delete = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+        to_update = []
+        to_create = []
+        for ingredient_id, amount in new_amounts.items():
+            recipe_ingredient = existing.get(ingredient_id)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredients(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+
+        if to_delete:
+            RecipeIngredients.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            RecipeIngredients.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredients.objects.bulk_create(to_create)
+        cart_totals.apply_changes(
+            cart_totals.get_cart_users(recipe.pk), changes
+        )
+        return True
+
+    def tags_update(self, tags_data, recipe):
+        old_tags = set(recipe.tags.values_list('pk', flat=True))
+        new_tags = {tag.pk for tag in tags_data}
+        recipe.tags.remove(*(old_tags - new_tags))
+        recipe.tags.add(*(new_tags - old_tags))
+        return old_tags != new_tags
+
 
 class RelatedRecipeSerializer(serializers.ModelSerializer):
+    image_thumb = ImageVariantField(images.THUMB, source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumb', 'cooking_time')
 
 
 class CustomUserRecipesSerializer(serializers.ModelSerializer,
                                   IsSubscribedMixin):
     recipes = RelatedRecipeSerializer(many=True)
-    recipes_count = serializers.IntegerField()
+    avatar_thumb = ImageVariantField(images.THUMB, source='avatar')
 
     class Meta:
         model = CustomUser
@@ -305,23 +423,11 @@ class CustomUserRecipesSerializer(serializers.ModelSerializer,
             'is_subscribed',
             'recipes',
             'recipes_count',
+            'followers_count',
             'avatar',
+            'avatar_thumb',
         )
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        recipes_limit = self.context.get(
-            'request').query_params.get('recipes_limit')
-        if recipes_limit:
-            try:
-                recipes_limit = int(recipes_limit)
-                representation['recipes'] = (
-                    representation['recipes'][:recipes_limit]
-                )
-            except ValueError:
-                pass
-        return representation
-
 
 class AvatarUpdateSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField(required=True)
@@ -0,0 +1,49 @@
+import csv
+import json
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def stream_txt(ingredients):
+    separator = ''
+    for ingredient in ingredients:
+        yield (
+            f"{separator}{ingredient['ingredient_name']} "
+            f"({ingredient['measurement_unit']}) — "
+            f"{ingredient['total_amount']} {ingredient['measurement_unit']}"
+        )
+        separator = '\n'
+
+
+def stream_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient_name'],
+            ingredient['measurement_unit'],
+            ingredient['total_amount'],
+        ))
+
+
+def stream_json(ingredients):
+    separator = ''
+    yield '['
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient_name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': ingredient['total_amount'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+STREAMS = {
+    'txt': stream_txt,
+    'csv': stream_csv,
+    'json': stream_json,
+}
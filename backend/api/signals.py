@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import authentication
+from users.models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    authentication.invalidate([instance.key])
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(instance, **kwargs):
+    authentication.invalidate(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
@@ -0,0 +1,1528 @@
+import asyncio
+import json
+import re
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image as PILImage
+from psycopg2 import extensions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import authentication, plans, relations
+from api.async_views import StreamingASGIHandler
+from api.autocomplete import ingredient_index
+from backend.db_pool.pool import ConnectionPool, PoolTimeout
+from backend import metrics
+from backend.metrics import registry
+from backend.metrics.middleware import MetricsMiddleware
+from recipes import cart_totals, catalog, fake_data, feed, images, search
+from recipes.models import (CatalogVersion, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredients, Tag)
+from users.models import CustomUser
+
+RECIPES_URL = '/api/recipes/'
+INGREDIENTS_URL = '/api/ingredients/'
+TAGS_URL = '/api/tags/'
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+ME_URL = '/api/users/me/'
+FEED_URL = '/api/recipes/feed/'
+METRICS_URL = '/metrics'
+
+
+def create_user(username):
+    return CustomUser.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password-12345',
+        first_name=username,
+        last_name=username,
+    )
+
+
+def create_recipe(author, name, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text=f'Описание {name}',
+        cooking_time=10,
+        image='pics/test.png',
+    )
+    recipe.tags.set(tags)
+    RecipeIngredients.objects.bulk_create(
+        RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    )
+    return recipe
+
+
+def clear_caches():
+    for alias in ('catalog', 'fragments', 'tokens'):
+        caches[alias].clear()
+
+
+class RecipeFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(4)
+        ]
+        cls.recipes = [
+            create_recipe(
+                cls.author,
+                f'рецепт {index}',
+                cls.tags,
+                [(ingredient, index + 1) for ingredient in cls.ingredients],
+            )
+            for index in range(12)
+        ]
+        cls.user.fav.add(*cls.recipes[::2])
+        cls.user.cart.add(*cls.recipes[::3])
+        cls.user.subs.add(cls.author)
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeListQueriesTest(RecipeFixtureMixin, TestCase):
+    LIMITS = (1, 5, 10)
+
+    def assert_constant_queries(self, client, expected):
+        for limit in self.LIMITS:
+            with self.subTest(limit=limit):
+                clear_caches()
+                with self.assertNumQueries(expected):
+                    response = client.get(RECIPES_URL, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries_do_not_depend_on_limit(self):
+        self.assert_constant_queries(self.anonymous, 5)
+
+    def test_authenticated_list_queries_do_not_depend_on_limit(self):
+        self.assert_constant_queries(self.client, 6)
+
+    def test_list_flags(self):
+        response = self.client.get(RECIPES_URL, {'limit': 12})
+        results = {item['id']: item for item in response.data['results']}
+        for index, recipe in enumerate(self.recipes):
+            item = results[recipe.pk]
+            self.assertEqual(item['is_favorited'], index % 2 == 0)
+            self.assertEqual(item['is_in_shopping_cart'], index % 3 == 0)
+            self.assertTrue(item['author']['is_subscribed'])
+            self.assertEqual(len(item['tags']), 2)
+            self.assertEqual(len(item['ingredients']), 4)
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens-test',
+    },
+})
+class TokenCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+
+    def setUp(self):
+        clear_caches()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_me(self):
+        return self.client.get(ME_URL)
+
+    def test_cached_lookup(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_me().status_code, 200)
+        self.assertFalse([
+            query for query in queries
+            if 'authtoken_token' in query['sql']
+        ])
+        self.assertIsNotNone(caches['tokens'].get(
+            authentication.get_cache_key(self.token.key)
+        ))
+
+    def test_snapshot_leaves_out_password(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        snapshot = caches['tokens'].get(
+            authentication.get_cache_key(self.token.key)
+        )
+        self.assertNotIn(self.user.password, snapshot.user_values)
+        self.assertFalse(
+            set(snapshot.excluded_fields) & set(snapshot.user_fields)
+        )
+        user, token = snapshot.restore()
+        self.assertEqual(
+            (user.pk, user.username, user.is_active, token.key),
+            (self.user.pk, self.user.username, True, self.token.key)
+        )
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_revoked_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertEqual(
+            self.client.post('/api/auth/token/logout/').status_code, 204
+        )
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_deleted_user(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_counters_are_not_cached(self):
+        self.assertEqual(self.get_me().data['recipes_count'], 0)
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            recipes_count=3, followers_count=2
+        )
+        data = self.get_me().data
+        self.assertEqual(
+            (data['recipes_count'], data['followers_count']), (3, 2)
+        )
+
+
+class PaginationModeTest(RecipeFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.subs.add(
+            *(create_user(f'author{index}') for index in range(4))
+        )
+
+    def walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_modes_share_ordering(self):
+        for url in (RECIPES_URL, SUBSCRIPTIONS_URL):
+            with self.subTest(url=url):
+                pages = self.walk(url, {'limit': 2})
+                cursor = self.walk(url, {'limit': 2, 'paginate': 'cursor'})
+                self.assertEqual(cursor, pages)
+                self.assertEqual(len(set(pages)), len(pages))
+
+    def test_subscriptions_order(self):
+        self.assertEqual(
+            self.walk(SUBSCRIPTIONS_URL, {'paginate': 'cursor'}),
+            list(self.user.subs.values_list('pk', flat=True))
+        )
+
+
+class IngredientCatalogCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('соль', 'сахар', 'перец'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        clear_caches()
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def get_names(self, prefix):
+        response = self.client.get(INGREDIENTS_URL, {'name': prefix})
+        self.assertEqual(response.status_code, 200)
+        return response, {
+            item['name'] for item in json.loads(response.content)
+        }
+
+    def test_response_follows_version_bumped_by_another_process(self):
+        _, names = self.get_names('с')
+        self.assertEqual(names, {'соль', 'сахар'})
+
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='сода', measurement_unit='г')]
+        )
+        CatalogVersion.objects.filter(name=catalog.INGREDIENTS).update(
+            version=F('version') + 1
+        )
+
+        response, names = self.get_names('с')
+        self.assertEqual(names, {'соль', 'сахар', 'сода'})
+        version = CatalogVersion.objects.get(name=catalog.INGREDIENTS).version
+        self.assertEqual(response['ETag'], f'"ingredients-{version}"')
+
+
+class LimitTest(RecipeFixtureMixin, TestCase):
+    def test_invalid_limits_are_rejected(self):
+        for url in (RECIPES_URL, SUBSCRIPTIONS_URL, FEED_URL):
+            for params in (
+                {'limit': 0},
+                {'limit': -1},
+                {'limit': 'abc'},
+                {'limit': 0, 'paginate': 'cursor'},
+            ):
+                with self.subTest(url=url, **params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('limit', response.data)
+
+    def test_limit(self):
+        for limit, expected in ((1, 1), ('', 10), (1000, 12)):
+            with self.subTest(limit=limit):
+                response = self.client.get(RECIPES_URL, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), expected)
+
+    def test_recipes_limit(self):
+        for recipes_limit, expected in ((0, 0), (1, 1), ('', 12), (100, 12)):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL, {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data['results'][0]['recipes']), expected
+                )
+        for recipes_limit in (-1, 'abc'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    SUBSCRIPTIONS_URL, {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.data)
+
+    def test_subscribe_rejects_limit_before_saving(self):
+        other = create_user('other')
+        url = f'/api/users/{other.pk}/subscribe/?recipes_limit=-1'
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertFalse(self.user.subs.filter(pk=other.pk).exists())
+        url = f'/api/users/{other.pk}/subscribe/?recipes_limit=0'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['recipes'], [])
+
+
+class CatalogConditionalTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def assert_invalidated(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return json.loads(response.content)
+
+    def test_tag_change(self):
+        def rename():
+            self.tag.name = 'Ужин'
+            self.tag.save()
+
+        data = self.assert_invalidated(TAGS_URL, rename)
+        self.assertEqual([item['name'] for item in data], ['Ужин'])
+        data = self.assert_invalidated(
+            f'{TAGS_URL}{self.tag.pk}/',
+            lambda: Tag.objects.create(name='Обед', slug='lunch')
+        )
+        self.assertEqual(data['name'], 'Ужин')
+
+    def test_ingredient_change(self):
+        data = self.assert_invalidated(
+            INGREDIENTS_URL,
+            lambda: Ingredient.objects.create(
+                name='сахар', measurement_unit='г'
+            )
+        )
+        self.assertEqual(len(data), 2)
+
+    def test_version_bumped_by_another_process(self):
+        def bump():
+            CatalogVersion.objects.filter(name=catalog.TAGS).update(
+                version=F('version') + 1
+            )
+
+        self.assert_invalidated(TAGS_URL, bump)
+
+
+class IngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        clear_caches()
+        ingredient_index.invalidate()
+
+    def search_names(self, prefix):
+        return [item['name'] for item in ingredient_index.search(prefix)]
+
+    def test_edit_refreshes_index(self):
+        self.assertEqual(self.search_names('со'), ['соль'])
+        self.salt.name = 'сахар'
+        self.salt.save()
+        self.assertEqual(self.search_names('со'), [])
+        self.assertEqual(self.search_names('са'), ['сахар'])
+
+    def test_versions_read_once_per_request(self):
+        self.assertEqual(self.client.get(INGREDIENTS_URL).status_code, 200)
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(INGREDIENTS_URL, {'name': 'со'})
+        self.assertEqual(
+            [item['name'] for item in json.loads(response.content)], ['соль']
+        )
+        self.assertEqual(len([
+            query for query in queries
+            if CatalogVersion._meta.db_table in query['sql']
+        ]), 1)
+
+    def test_bulk_load_refreshes_index(self):
+        self.assertEqual(self.search_names('со'), ['соль'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'ingredients.csv'
+            path.write_text('сода,г\n', encoding='utf-8')
+            call_command('load_ingredients', str(path), stdout=StringIO())
+        self.assertEqual(self.search_names('со'), ['соль', 'сода'])
+
+
+class LoadIngredientsTest(TestCase):
+    def load(self, name, content, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / name
+            path.write_text(content, encoding='utf-8')
+            errors = StringIO()
+            call_command(
+                'load_ingredients', str(path),
+                stdout=StringIO(), stderr=errors, **options
+            )
+        return errors.getvalue()
+
+    def test_csv_skips_malformed_rows(self):
+        errors = self.load(
+            'ingredients.csv', 'соль,г\n\nсахар\n,кг\nперец, г \n',
+            batch_size=1
+        )
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('соль', 'г'), ('перец', 'г')}
+        )
+        self.assertEqual(errors.count('пропущена'), 2)
+
+    def test_json_items_across_chunks(self):
+        items = [
+            {'name': f'ингредиент {index}', 'measurement_unit': 'г'}
+            for index in range(200)
+        ]
+        with mock.patch(
+            'recipes.management.commands.load_ingredients.CHUNK_SIZE', 7
+        ):
+            errors = self.load(
+                'ingredients.json',
+                json.dumps([*items, {'name': 'без единицы'}, 'строка'],
+                           ensure_ascii=False, indent=1)
+            )
+        self.assertEqual(Ingredient.objects.count(), len(items))
+        self.assertEqual(errors.count('пропущена'), 2)
+
+
+class ShoppingListDownloadTest(RecipeFixtureMixin, TestCase):
+    def test_formats(self):
+        expected = sum(index + 1 for index in range(0, 12, 3))
+        for file_format, media_type in (
+            ('txt', 'text/plain'),
+            ('csv', 'text/csv'),
+            ('json', 'application/json'),
+        ):
+            with self.subTest(format=file_format):
+                response = self.client.get(
+                    DOWNLOAD_URL, {'format': file_format}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.streaming)
+                self.assertTrue(
+                    response['Content-Type'].startswith(media_type)
+                )
+                content = b''.join(response.streaming_content).decode()
+                self.assertIn(str(expected), content)
+
+    def test_errors_are_json(self):
+        for file_format in ('txt', 'csv', 'json'):
+            with self.subTest(format=file_format):
+                response = self.anonymous.get(
+                    DOWNLOAD_URL, {'format': file_format}
+                )
+                self.assertEqual(response.status_code, 401)
+                self.assertTrue(
+                    response['Content-Type'].startswith('application/json')
+                )
+                self.assertIn('detail', json.loads(response.content))
+
+
+class ImageVariantTest(RecipeFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        content = BytesIO()
+        PILImage.new('RGB', (800, 600), 'red').save(content, 'PNG')
+        self.recipe = self.recipes[-1]
+        self.recipe.image.save(
+            'variant.png', ContentFile(content.getvalue()), save=False
+        )
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image=self.recipe.image.name
+        )
+
+    def get_image(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_variants_are_recorded_and_served(self):
+        detail_url = f'{RECIPES_URL}{self.recipe.pk}/'
+        response = self.get_image(detail_url)
+        self.assertTrue(response.data['image'].endswith('.png'))
+        self.assertIsNone(response.data['image_webp'])
+        etag = response['ETag']
+
+        images.update_variants(
+            Recipe, self.recipe.pk, 'image', self.recipe.image.name
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            set(self.recipe.image_variants), {images.SOURCE, *images.FORMATS}
+        )
+
+        with mock.patch.object(
+            FileSystemStorage, 'exists', side_effect=AssertionError
+        ):
+            response = self.client.get(
+                detail_url, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['image'].endswith('variant.png'))
+            self.assertTrue(
+                response.data['image_webp'].endswith('variant.webp')
+            )
+            items = self.get_image(RECIPES_URL).data['results']
+        item = next(item for item in items if item['id'] == self.recipe.pk)
+        self.assertTrue(item['image'].endswith('variant.png'))
+        self.assertTrue(item['image_thumb'].endswith('variant.thumb.webp'))
+
+    def test_new_image_falls_back_to_original(self):
+        images.update_variants(
+            Recipe, self.recipe.pk, 'image', self.recipe.image.name
+        )
+        self.recipe.refresh_from_db()
+        self.recipe.image = 'pics/other.png'
+        self.recipe.save()
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image_variants)
+        response = self.get_image(f'{RECIPES_URL}{self.recipe.pk}/')
+        self.assertTrue(response.data['image'].endswith('other.png'))
+        self.assertIsNone(response.data['image_webp'])
+
+    def test_variants_recorded_for_one_row(self):
+        shared = self.recipes[0]
+        Recipe.objects.filter(pk=shared.pk).update(
+            image=self.recipe.image.name
+        )
+        images.update_variants(
+            Recipe, self.recipe.pk, 'image', self.recipe.image.name
+        )
+        shared.refresh_from_db()
+        self.assertEqual(shared.image_variants, {})
+
+    def test_variants_scheduled_only_for_new_files(self):
+        images.update_variants(
+            Recipe, self.recipe.pk, 'image', self.recipe.image.name
+        )
+        self.recipe.refresh_from_db()
+        with mock.patch.object(images, 'schedule_variants') as schedule:
+            self.recipe.save()
+            self.author.set_password('new-password-12345')
+            self.author.save()
+            schedule.assert_not_called()
+            self.recipe.image = 'pics/other.png'
+            self.recipe.save()
+            schedule.assert_called_once_with(self.recipe, 'image')
+
+
+class FragmentCacheTest(RecipeFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.url = f'{RECIPES_URL}{self.recipe.pk}/'
+
+    def get(self, client=None):
+        response = (client or self.client).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_retrieve_reuses_fragment(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get()
+        self.assertFalse([
+            query for query in queries
+            if 'recipes_recipeingredients' in query['sql']
+        ])
+        self.assertEqual(len(data['ingredients']), 4)
+
+    def test_invalidation(self):
+        self.get()
+        self.recipe.name = 'новое название'
+        self.recipe.save()
+        self.assertEqual(self.get()['name'], 'новое название')
+
+        self.author.first_name = 'Автор'
+        self.author.save()
+        self.assertEqual(self.get()['author']['first_name'], 'Автор')
+
+        self.tags[0].name = 'Ужин'
+        self.tags[0].save()
+        self.assertIn('Ужин', [tag['name'] for tag in self.get()['tags']])
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_variants={
+            images.SOURCE: self.recipe.image.name,
+            images.WEBP: 'pics/test.webp',
+        })
+        self.assertTrue(self.get()['image_webp'].endswith('pics/test.webp'))
+
+        CustomUser.objects.filter(pk=self.author.pk).update(
+            avatar='pics/users/a.png',
+            avatar_variants={
+                images.SOURCE: 'pics/users/a.png',
+                images.THUMB: 'pics/users/a.thumb.webp',
+            }
+        )
+        self.assertTrue(
+            self.get()['author']['avatar_thumb'].endswith('a.thumb.webp')
+        )
+
+    def test_overlay_per_user(self):
+        other = create_user('other')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        data = self.get()
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertTrue(data['author']['is_subscribed'])
+
+        other.fav.add(self.recipe)
+        for client, favorited in (
+            (other_client, True), (self.anonymous, False)
+        ):
+            with self.subTest(favorited=favorited):
+                data = self.get(client)
+                self.assertEqual(data['is_favorited'], favorited)
+                self.assertFalse(data['is_in_shopping_cart'])
+                self.assertFalse(data['author']['is_subscribed'])
+                self.assertEqual(data['favorites_count'], 2)
+        items = other_client.get(
+            RECIPES_URL, {'limit': len(self.recipes)}
+        ).data['results']
+        self.assertEqual(
+            [item['id'] for item in items if item['is_favorited']],
+            [self.recipe.pk]
+        )
+
+
+class MetricsTest(RecipeFixtureMixin, TestCase):
+    def get_count(self, metric, view):
+        for name, labels, counts, total in registry.dump()['histograms']:
+            if name == metric and labels == [view, 'GET']:
+                return sum(counts)
+        return 0
+
+    def test_records_serializer_time_without_flushing(self):
+        view = 'recipes-list'
+        before = self.get_count('http_serialize_duration_seconds', view)
+        with mock.patch.object(registry, 'flush') as flush:
+            self.assertEqual(self.client.get(RECIPES_URL).status_code, 200)
+        flush.assert_not_called()
+        self.assertEqual(
+            self.get_count('http_serialize_duration_seconds', view),
+            before + 1
+        )
+
+    def test_collect_removes_files_of_dead_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for pid in (1001, 1002):
+                data = {
+                    'histograms': [],
+                    'counters': [['db_slow_queries_total', ['view'], pid]],
+                    'pool': {'default': {'size': 1}},
+                }
+                Path(directory, f'metrics-{pid}.json').write_text(
+                    json.dumps(data)
+                )
+            is_alive = mock.Mock(side_effect=lambda pid: pid == 1001)
+            with override_settings(METRICS_DIR=directory):
+                with mock.patch.object(metrics, 'is_alive', is_alive):
+                    _, counters, pools = metrics.collect()
+            self.assertEqual(
+                counters, {('db_slow_queries_total', ('view',)): 1001}
+            )
+            self.assertEqual(list(pools), [('default', 1001)])
+            self.assertEqual(
+                [path.name for path in Path(directory).iterdir()],
+                ['metrics-1001.json']
+            )
+
+    def test_async_middleware(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = MetricsMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        before = self.get_count('http_request_duration_seconds', 'unresolved')
+        response = asyncio.run(middleware(RequestFactory().get('/')))
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(
+            self.get_count('http_request_duration_seconds', 'unresolved'),
+            before + 1
+        )
+
+    def test_access(self):
+        self.assertEqual(self.anonymous.get(METRICS_URL).status_code, 403)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        staff = create_user('staff')
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_serialize_duration_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        for header, expected in (
+            ('Bearer secret', 200), ('Bearer wrong', 403)
+        ):
+            with self.subTest(header=header):
+                response = self.anonymous.get(
+                    METRICS_URL, HTTP_AUTHORIZATION=header
+                )
+                self.assertEqual(response.status_code, expected)
+
+
+class StreamingASGIHandlerTest(SimpleTestCase):
+    def test_streams_in_one_worker_thread(self):
+        threads = []
+        closed = []
+
+        def content():
+            for index in range(200):
+                threads.append(threading.get_ident())
+                yield f'{index}\n'
+
+        response = StreamingHttpResponse(content())
+        response.close = lambda: closed.append(threading.get_ident())
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            await StreamingASGIHandler().send_response(response, send)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        bodies = [
+            message for message in messages
+            if message['type'] == 'http.response.body'
+        ]
+        self.assertGreater(len(bodies), 2)
+        self.assertEqual(
+            b''.join(message.get('body', b'') for message in bodies),
+            ''.join(f'{index}\n' for index in range(200)).encode()
+        )
+        self.assertEqual(len(set(threads + closed)), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.healthy = True
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql):
+        if not self.connection.healthy:
+            raise OSError('соединение разорвано')
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, **kwargs)
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual((stats['size'], stats['in_use']), (1, 1))
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(max_size=1, timeout=1)
+        first = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, (first,))
+        timer.start()
+        self.assertIs(pool.acquire(), first)
+        timer.join()
+        self.assertEqual(len(self.opened), 1)
+
+    def test_unhealthy_connection_is_discarded(self):
+        pool = self.make_pool(health_check_interval=0)
+        first = pool.acquire()
+        pool.release(first)
+        first.healthy = False
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['health_check_failures'], 1)
+        self.assertEqual(stats['connections_closed'], 1)
+        self.assertEqual((stats['size'], stats['in_use']), (1, 1))
+
+    def test_release_rolls_back_open_transaction(self):
+        pool = self.make_pool()
+        connection = pool.acquire()
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertFalse(connection.closed)
+        self.assertIs(pool.acquire(), connection)
+
+        connection.rollback = mock.Mock(side_effect=OSError)
+        connection.status = extensions.TRANSACTION_STATUS_INERROR
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.connect = mock.Mock(side_effect=OSError)
+        with self.assertRaises(OSError):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['in_use']), (0, 0))
+        pool.connect = FakeConnection
+        self.assertIsInstance(pool.acquire(), FakeConnection)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_expired_connection_is_recycled(self):
+        pool = self.make_pool(max_lifetime=60)
+        connection = pool.acquire()
+        with mock.patch('backend.db_pool.pool.time.monotonic',
+                        return_value=time.monotonic() + 61):
+            pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(len(self.opened), 2)
+
+
+class DerivedFieldsTest(RecipeFixtureMixin, TestCase):
+    def test_full_save_keeps_derived_fields(self):
+        recipe = Recipe.objects.get(pk=self.recipes[1].pk)
+        author = CustomUser.objects.get(pk=self.author.pk)
+        create_user('follower').subs.add(self.author)
+        self.user.cart.add(recipe)
+        recipe.name = 'новое название'
+        recipe.save()
+        author.first_name = 'Автор'
+        author.save()
+        recipe.refresh_from_db()
+        author.refresh_from_db()
+        self.assertEqual(recipe.name, 'новое название')
+        self.assertEqual(recipe.carts_count, 1)
+        self.assertEqual(author.followers_count, 2)
+
+    def test_full_save_lists_update_fields(self):
+        recipe = Recipe.objects.defer('text').get(pk=self.recipes[1].pk)
+        with CaptureQueriesContext(connection) as queries:
+            recipe.save()
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"name"', updates[0])
+        for column in ('carts_count', 'search_vector', 'text'):
+            self.assertNotIn(f'"{column}"', updates[0])
+
+    def test_save_reinserts_deleted_row(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        Recipe.objects.filter(pk=recipe.pk).delete()
+        recipe.save()
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+
+class DriftCheckMixin:
+    def assert_no_drift(self):
+        for command in ('rebuild_cart_totals', 'rebuild_counters'):
+            output = StringIO()
+            call_command(command, '--check', stdout=output)
+            with self.subTest(command=command):
+                self.assertEqual(
+                    set(re.findall(r'асхождений:? (\d+)', output.getvalue())),
+                    {'0'}
+                )
+
+
+class RelationDriftTest(DriftCheckMixin, RecipeFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = create_user('other')
+        self.other.cart.add(*self.recipes[:4])
+        self.other.fav.add(*self.recipes[:4])
+        self.other.subs.add(self.author, self.user)
+
+    def test_fixture(self):
+        self.assert_no_drift()
+
+    def test_add(self):
+        self.user.cart.add(*self.recipes[1:6])
+        self.user.fav.add(*self.recipes[1:6])
+        self.user.subs.add(self.other)
+        self.assert_no_drift()
+
+    def test_remove(self):
+        self.user.cart.remove(*self.recipes[:4])
+        self.user.fav.remove(*self.recipes[:4])
+        self.user.subs.remove(self.author, self.other)
+        self.assert_no_drift()
+
+    def test_clear(self):
+        self.user.cart.clear()
+        self.user.fav.clear()
+        self.user.subs.clear()
+        self.assert_no_drift()
+
+    def test_reverse_side(self):
+        recipe, another = self.recipes[0], self.recipes[1]
+        recipe.in_cart_of.remove(self.user, self.author)
+        another.in_cart_of.add(self.user, self.author)
+        recipe.fav_by.add(self.author)
+        another.fav_by.remove(self.other)
+        self.author.followers.remove(self.user)
+        self.user.followers.add(self.author)
+        self.assert_no_drift()
+        another.in_cart_of.clear()
+        recipe.fav_by.clear()
+        self.author.followers.clear()
+        self.assert_no_drift()
+
+    def test_api(self):
+        recipe = self.recipes[1]
+        for url in (
+            f'{RECIPES_URL}{recipe.pk}/shopping_cart/',
+            f'{RECIPES_URL}{recipe.pk}/favorite/',
+        ):
+            self.assertEqual(self.client.post(url).status_code, 201)
+            self.assert_no_drift()
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.assert_no_drift()
+        ids = {'ids': [recipe.pk for recipe in self.recipes[:6]]}
+        for url in (
+            f'{RECIPES_URL}shopping_cart/', f'{RECIPES_URL}favorite/'
+        ):
+            for method in (self.client.post, self.client.delete):
+                self.assertLess(
+                    method(url, ids, format='json').status_code, 300
+                )
+                self.assert_no_drift()
+
+    def test_single_endpoints_lock_and_repeat(self):
+        recipe = self.recipes[1]
+        for url in (
+            f'{RECIPES_URL}{recipe.pk}/shopping_cart/',
+            f'{RECIPES_URL}{recipe.pk}/favorite/',
+        ):
+            for method, codes in (
+                (self.client.post, (201, 400)),
+                (self.client.delete, (204, 400)),
+            ):
+                with mock.patch.object(
+                    relations, 'lock_user', wraps=relations.lock_user
+                ) as lock_user:
+                    self.assertEqual(
+                        [method(url).status_code for _ in codes],
+                        list(codes)
+                    )
+                self.assertEqual(lock_user.call_count, 2)
+                self.assert_no_drift()
+
+    def test_subscribe_endpoint_locks(self):
+        url = f'/api/users/{self.other.pk}/subscribe/'
+        for method, code in ((self.client.post, 201),
+                             (self.client.delete, 204)):
+            with mock.patch.object(
+                relations, 'lock_user', wraps=relations.lock_user
+            ) as lock_user:
+                self.assertEqual(method(url).status_code, code)
+            lock_user.assert_called_once_with(self.user)
+            self.assert_no_drift()
+        with mock.patch.object(relations, 'change', return_value=False):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.user.subs.filter(pk=self.other.pk).exists())
+
+    def test_single_totals_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.cart.add(*self.recipes[1:3])
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith(
+                'UPDATE "recipes_shoppingcarttotal"'
+            )
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assert_no_drift()
+
+    def test_recipe_delete(self):
+        self.recipes[0].delete()
+        self.assert_no_drift()
+
+    def test_user_delete(self):
+        self.other.delete()
+        self.assert_no_drift()
+
+    def test_admin_edit(self):
+        admin = create_user('admin')
+        admin.is_staff = admin.is_superuser = True
+        admin.save()
+        self.client.force_login(admin)
+        recipe = self.recipes[0]
+        added = Ingredient.objects.create(name='соль', measurement_unit='г')
+        rows = list(recipe.recipeingredients.order_by('pk'))
+        data = {
+            'name': recipe.name,
+            'author': self.other.pk,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.pk for tag in self.tags],
+            'recipeingredients-TOTAL_FORMS': len(rows) + 1,
+            'recipeingredients-INITIAL_FORMS': len(rows),
+            'recipeingredients-MIN_NUM_FORMS': 1,
+            'recipeingredients-MAX_NUM_FORMS': 1000,
+        }
+        for index, row in enumerate(rows):
+            prefix = f'recipeingredients-{index}-'
+            data.update({
+                f'{prefix}id': row.pk,
+                f'{prefix}recipe': recipe.pk,
+                f'{prefix}ingredient': row.ingredient_id,
+                f'{prefix}amount': row.amount + 5,
+            })
+        data['recipeingredients-0-DELETE'] = 'on'
+        data.update({
+            f'recipeingredients-{len(rows)}-recipe': recipe.pk,
+            f'recipeingredients-{len(rows)}-ingredient': added.pk,
+            f'recipeingredients-{len(rows)}-amount': 7,
+        })
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.pk}/change/', data
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            cart_totals.get_amounts([recipe.pk]),
+            {
+                **{row.ingredient_id: row.amount + 5 for row in rows[1:]},
+                added.pk: 7,
+            }
+        )
+        self.assert_no_drift()
+
+        response = self.client.post('/admin/recipes/recipe/', {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': self.recipes[1].pk,
+            'form-0-name': self.recipes[1].name,
+            'form-0-author': self.user.pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.recipes[1].refresh_from_db()
+        self.assertEqual(self.recipes[1].author, self.user)
+        self.assert_no_drift()
+
+
+class BulkRelationTest(DriftCheckMixin, RecipeFixtureMixin, TestCase):
+    MISSING = 10 ** 6
+
+    def change(self, method, url, ids, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query['sql'] for query in queries
+            if re.match(
+                rf'(INSERT (OR IGNORE )?INTO|DELETE FROM) "{table}"',
+                query['sql']
+            )
+        ]
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(
+            len(writes), int(bool({'added', 'removed'} & set(statuses)))
+        )
+        self.assert_no_drift()
+        return statuses
+
+    def test_favorite_bulk(self):
+        url = f'{RECIPES_URL}favorite/'
+        first, second = self.recipes[0].pk, self.recipes[1].pk
+        ids = [first, second, self.MISSING, second]
+        self.assertEqual(
+            self.change(self.client.post, url, ids, 'users_customuser_fav'),
+            ['already_added', 'added', 'not_found']
+        )
+        self.assertTrue(self.user.fav.filter(pk=second).exists())
+        self.assertEqual(
+            self.change(self.client.delete, url, [first, self.MISSING],
+                        'users_customuser_fav'),
+            ['removed', 'not_found']
+        )
+        self.assertEqual(
+            self.change(self.client.delete, url, [first],
+                        'users_customuser_fav'),
+            ['not_added']
+        )
+        self.assertFalse(self.user.fav.filter(pk=first).exists())
+
+    def test_shopping_cart_bulk(self):
+        url = f'{RECIPES_URL}shopping_cart/'
+        ids = [recipe.pk for recipe in self.recipes[:3]]
+        self.assertEqual(
+            self.change(self.client.post, url, ids, 'users_customuser_cart'),
+            ['already_added', 'added', 'added']
+        )
+        self.assertEqual(
+            self.change(self.client.delete, url, ids,
+                        'users_customuser_cart'),
+            ['removed', 'removed', 'removed']
+        )
+        self.assertFalse(self.user.cart.filter(pk__in=ids).exists())
+
+    def test_subs_bulk(self):
+        url = '/api/users/subscribe/'
+        other = create_user('other')
+        ids = [self.author.pk, other.pk, self.user.pk, self.MISSING]
+        self.assertEqual(
+            self.change(self.client.post, url, ids,
+                        'users_customuser_subs'),
+            ['already_added', 'added', 'forbidden', 'not_found']
+        )
+        self.assertEqual(
+            self.change(self.client.delete, url, ids,
+                        'users_customuser_subs'),
+            ['removed', 'removed', 'not_added', 'not_found']
+        )
+        self.assertFalse(self.user.subs.exists())
+
+    def test_validation(self):
+        url = f'{RECIPES_URL}favorite/'
+        for data in ({'ids': []}, {'ids': [0]}, {'ids': ['x']}, {}):
+            with self.subTest(data=data):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = self.anonymous.post(
+            url, {'ids': [self.recipes[0].pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class FakeDataTest(DriftCheckMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(20)
+        )
+
+    def test_generate(self):
+        dataset = fake_data.Dataset(
+            users=8, recipes=30, favorites=3, carts=2, subscriptions=3
+        )
+        phases = [phase for phase, count in fake_data.generate(dataset)]
+        self.assertIn('relations', phases)
+        self.assertEqual(fake_data.get_users().count(), 8)
+        recipes = Recipe.objects.filter(
+            name__startswith=fake_data.RECIPE_PREFIX
+        )
+        self.assertEqual(recipes.count(), 30)
+        for recipe in recipes:
+            self.assertEqual(
+                recipe.image_variants[images.SOURCE], recipe.image.name
+            )
+            self.assertEqual(
+                set(recipe.image_variants), {images.SOURCE, *images.FORMATS}
+            )
+        self.assertFalse(
+            fake_data.get_users().exclude(avatar_variants={}).exists()
+        )
+        self.assert_no_drift()
+
+
+@override_settings(FEED_FANOUT_LIMIT=2, FEED_BACKFILL_SIZE=3)
+class FeedTest(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        patcher = mock.patch.object(images, 'schedule_variants')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with transaction.atomic():
+            self.author = create_user('author')
+            self.readers = [
+                create_user(f'reader{index}') for index in range(2)
+            ]
+            self.recipes = [
+                create_recipe(self.author, f'рецепт {index}')
+                for index in range(5)
+            ]
+        feed.wait_pending()
+
+    def get_feed(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(FEED_URL, {'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def get_entries(self, user):
+        feed.wait_pending()
+        return sorted(
+            FeedEntry.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            ),
+            reverse=True
+        )
+
+    def latest(self, count):
+        return [recipe.pk for recipe in self.recipes[::-1][:count]]
+
+    def test_backfill_and_fan_out(self):
+        reader = self.readers[0]
+        reader.subs.add(self.author)
+        self.assertEqual(self.get_entries(reader), self.latest(3))
+        self.recipes.append(create_recipe(self.author, 'новый'))
+        self.assertEqual(self.get_entries(reader), self.latest(4))
+        self.assertEqual(self.get_feed(reader), self.latest(4))
+
+    def test_fanout_limit_crossings(self):
+        first, second = self.readers
+        first.subs.add(self.author)
+        second.subs.add(self.author)
+        self.assertEqual(self.get_entries(first), [])
+        self.recipes.append(create_recipe(self.author, 'новый'))
+        self.assertEqual(self.get_entries(second), [])
+        self.assertEqual(self.get_feed(first), self.latest(6))
+
+        second.subs.remove(self.author)
+        self.assertEqual(self.get_entries(first), self.latest(3))
+        self.assertEqual(self.get_entries(second), [])
+        self.assertEqual(self.get_feed(second), [])
+
+        self.author.followers.add(second)
+        self.assertEqual(self.get_entries(first), [])
+        self.author.followers.clear()
+        self.assertEqual(self.get_feed(first), [])
+
+    def test_author_change_and_delete(self):
+        other_author = create_user('other_author')
+        first, second = self.readers
+        first.subs.add(self.author)
+        second.subs.add(other_author)
+        recipe = self.recipes[-1]
+        recipe.author = other_author
+        with transaction.atomic():
+            recipe.save()
+        self.assertEqual(self.get_entries(first), self.latest(3)[1:])
+        self.assertEqual(self.get_entries(second), [recipe.pk])
+        recipe.delete()
+        self.assertEqual(self.get_entries(second), [])
+
+    def test_errors_are_logged(self):
+        self.readers[0].subs.add(self.author)
+        with mock.patch.object(
+            feed, 'fan_out', autospec=True, side_effect=RuntimeError
+        ), self.assertLogs('recipes.feed', 'ERROR'):
+            create_recipe(self.author, 'новый')
+            feed.wait_pending()
+
+
+class SearchRenameTest(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.ingredient = Ingredient.objects.create(
+            name='шафран', measurement_unit='г'
+        )
+        self.recipe = create_recipe(
+            create_user('author'), 'плов', ingredients=[(self.ingredient, 1)]
+        )
+        create_recipe(create_user('other'), 'суп')
+        search.update_vectors([self.recipe.pk])
+
+    def search_ids(self, value):
+        response = self.client.get(RECIPES_URL, {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_results_follow_ingredient_rename(self):
+        self.assertEqual(self.search_ids('шафран'), [self.recipe.pk])
+        self.assertEqual(self.search_ids('куркума'), [])
+
+        self.ingredient.name = 'куркума'
+        self.ingredient.save()
+        search.executor.submit(int).result()
+
+        self.assertEqual(self.search_ids('шафран'), [])
+        self.assertEqual(self.search_ids('куркума'), [self.recipe.pk])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+class RecipeFilterPlanTest(TestCase):
+    RECIPES = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        author = create_user('author')
+        breakfast, lunch = (
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'рецепт {index}',
+                text='Описание рецепта. ' * 50,
+                cooking_time=10,
+                image='pics/test.png',
+            )
+            for index in range(cls.RECIPES)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for index, recipe in enumerate(recipes)
+            for tag in (breakfast, lunch)[:index % 2 + 1]
+        )
+        cls.user.fav.add(*recipes[::2])
+        cls.user.cart.add(*recipes[::3])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_list_plan(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        sql = next(
+            query['sql'] for query in queries
+            if ' FROM "recipes_recipe" ' in query['sql']
+            and query['sql'].endswith('LIMIT 10')
+        )
+        return plans.explain(sql)
+
+    def test_no_sort_over_recipe_row(self):
+        for params in (
+            {'tags': ['breakfast', 'lunch']},
+            {'tags': ['breakfast', 'lunch'], 'is_favorited': 1},
+            {'tags': 'lunch', 'is_in_shopping_cart': 1},
+        ):
+            with self.subTest(**params):
+                plan = self.get_list_plan(params)
+                self.assertEqual(plans.get_row_nodes(plan), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+class IndexPlanTest(TestCase):
+    USERS = 200
+    RECIPES = 5000
+    INDEX_SCANS = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+    @classmethod
+    def setUpTestData(cls):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                first_name='user',
+                last_name='user',
+            )
+            for index in range(cls.USERS)
+        )
+        tags = [
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(100)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=users[index % cls.USERS],
+                name=f'рецепт {index}',
+                text='Описание рецепта.',
+                cooking_time=10,
+                image='pics/test.png',
+            )
+            for index in range(cls.RECIPES)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[index % 2])
+            for index, recipe in enumerate(recipes)
+        )
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient=ingredients[(index + shift) % len(ingredients)],
+                amount=1,
+            )
+            for index, recipe in enumerate(recipes)
+            for shift in range(3)
+        )
+        for through, field in (
+            (CustomUser.fav.through, 'recipe'),
+            (CustomUser.cart.through, 'recipe'),
+        ):
+            through.objects.bulk_create(
+                through(customuser=user, **{field: recipe})
+                for index, user in enumerate(users)
+                for recipe in recipes[index::cls.USERS // 4]
+            )
+        CustomUser.subs.through.objects.bulk_create(
+            CustomUser.subs.through(
+                from_customuser=user,
+                to_customuser=users[(index + shift) % cls.USERS],
+            )
+            for index, user in enumerate(users)
+            for shift in range(1, 6)
+        )
+        cls.user, cls.author = users[0], users[1]
+        cls.recipe, cls.tag = recipes[0], tags[0]
+        cls.ingredient = ingredients[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assert_index_scan(self, queryset, relation):
+        sql, params = queryset.query.sql_with_params()
+        scans = plans.get_scans(plans.explain(sql, params), relation)
+        self.assertTrue(scans)
+        self.assertLessEqual(set(scans), self.INDEX_SCANS)
+
+    def test_lookups_use_indexes(self):
+        for name, queryset, relation in (
+            ('fav', self.user.fav.all(), 'users_customuser_fav'),
+            ('cart', self.user.cart.all(), 'users_customuser_cart'),
+            ('subs', self.user.subs.all(), 'users_customuser_subs'),
+            ('fav_by', self.recipe.fav_by.all(), 'users_customuser_fav'),
+            ('in_cart_of', self.recipe.in_cart_of.all(),
+             'users_customuser_cart'),
+            ('followers', self.author.followers.all(),
+             'users_customuser_subs'),
+            ('tag_recipes', self.tag.recipes.values('pk'),
+             'recipes_recipe_tags'),
+            ('recipe_ingredients', self.recipe.recipeingredients.all(),
+             'recipes_recipeingredients'),
+            ('ingredient_recipes', self.ingredient.listingredients.all(),
+             'recipes_recipeingredients'),
+            ('author_recipes', self.author.recipes.all()[:10],
+             'recipes_recipe'),
+        ):
+            with self.subTest(name):
+                self.assert_index_scan(queryset, relation)
@@ -1,8 +1,18 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import URLPattern, include, path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import async_view
 from api.views import (ChangePasswordViewSet, CustomUserViewSet,
-                       IngredientViewSet, RecipeViewSet, TagViewSet)
+                       DatabasePoolStatsView, IngredientViewSet,
+                       RecipeViewSet, TagViewSet)
+
+ASYNC_VIEW_NAMES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+    'ingredients-list',
+)
 
 v1_router = DefaultRouter()
 v1_router.register('tags', TagViewSet, basename='tags')
@@ -11,10 +21,23 @@ v1_router.register('recipes', RecipeViewSet, basename='recipes')
 
 v1_router.register('users', CustomUserViewSet, basename='users')
 
+router_urls = v1_router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        ) if pattern.name in ASYNC_VIEW_NAMES else pattern
+        for pattern in router_urls
+    ]
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('users/set_password/',
          ChangePasswordViewSet.as_view(),
          name='change_password'),
-    path('', include(v1_router.urls)),
+    path('db_pool/', DatabasePoolStatsView.as_view(), name='db_pool'),
+    path('', include(router_urls)),
 ]
@@ -1,35 +1,65 @@
-from django.db.models import Count, F, Sum
-from django.http import HttpResponse
+from django.db.models import (Exists, F, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, permissions, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from api import fragments
+from api.autocomplete import ingredient_index
+from api.conditional import catalog_etag, catalog_last_modified, recipe_etag
 from api.filtersets import RecipeFilterSet
-from api.mixins import RecipeActionMixin
-from api.paginators import CustomPagination
+from api.mixins import (BulkRelationMixin, CatalogCacheMixin,
+                        RecipeActionMixin)
+from api.paginators import FeedPagination, SwitchablePagination, get_limit
 from api.permissions import AuthorOrAdmin
+from api.renderers import CSVRenderer, DetailRenderer, PlainTextRenderer
 from api.serializers import (AvatarUpdateSerializer, ChangePasswordSerializer,
                              CustomUserRecipesSerializer, CustomUserSerializer,
                              IngredientSerializer, RecipeSerializer,
                              SubscriptionSerializer, TagSerializer)
+from api.shopping_list import STREAMS
+from backend import db_pool
+from recipes import catalog, queries
 from recipes.models import Ingredient, Recipe, Tag
 from users.models import CustomUser
 
 
-class TagViewSet(mixins.ListModelMixin,
+tags_condition = condition(
+    etag_func=catalog_etag(catalog.TAGS),
+    last_modified_func=catalog_last_modified(catalog.TAGS)
+)
+ingredients_condition = condition(
+    etag_func=catalog_etag(catalog.INGREDIENTS),
+    last_modified_func=catalog_last_modified(catalog.INGREDIENTS)
+)
+
+
+@method_decorator(tags_condition, name='list')
+@method_decorator(tags_condition, name='retrieve')
+class TagViewSet(CatalogCacheMixin,
+                 mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
                  viewsets.GenericViewSet):
+    catalog_name = catalog.TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(mixins.ListModelMixin,
+@method_decorator(ingredients_condition, name='list')
+@method_decorator(ingredients_condition, name='retrieve')
+class IngredientViewSet(CatalogCacheMixin,
+                        mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
                         viewsets.GenericViewSet):
+    catalog_name = catalog.INGREDIENTS
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -41,15 +71,61 @@ class IngredientViewSet(mixins.ListModelMixin,
             queryset = queryset.filter(name__istartswith=name)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.search, request, *args, **kwargs
+        )
+
+    def search(self, request, *args, **kwargs):
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''), request
+        ))
+
 
-class RecipeViewSet(viewsets.ModelViewSet, RecipeActionMixin):
+@method_decorator(condition(etag_func=recipe_etag), name='retrieve')
+class RecipeViewSet(viewsets.ModelViewSet, RecipeActionMixin,
+                    BulkRelationMixin):
     queryset = Recipe.objects.all().order_by('-id')
     serializer_class = RecipeSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
+    pagination_class = SwitchablePagination
     permission_classes = (AuthorOrAdmin,
                           permissions.IsAuthenticatedOrReadOnly)
 
+    def get_queryset(self):
+        queryset = self.queryset.select_related('author').defer(
+            'search_vector'
+        )
+        if self.action not in ('list', 'retrieve', 'feed'):
+            queryset = queryset.prefetch_related(*fragments.get_prefetches())
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False)
+            )
+        return queryset.annotate(
+            is_favorited=Exists(CustomUser.fav.through.objects.filter(
+                customuser=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(CustomUser.cart.through.objects.filter(
+                customuser=user, recipe=OuterRef('pk')))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        return Response(
+            fragments.get_representation(self.get_serializer(recipe), recipe)
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(response, 'exception', False) and isinstance(
+            getattr(request, 'accepted_renderer', None), DetailRenderer
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
     def update(self, request, *args, **kwargs):
         if request.method == 'PUT':
             raise MethodNotAllowed(method='PUT')
@@ -77,6 +153,31 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeActionMixin):
             recipe=recipe
         )
 
+    @action(detail=False,
+            methods=('post', 'delete'),
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='favorite')
+    def favorite_bulk(self, request):
+        return self.change_relation('fav', Recipe.objects.all())
+
+    @action(detail=False,
+            methods=('post', 'delete'),
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='shopping_cart')
+    def shopping_cart_bulk(self, request):
+        return self.change_relation('cart', Recipe.objects.all())
+
+    @action(detail=False,
+            methods=('get',),
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='feed')
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_feed(request.user, request)
+        recipes = self.get_queryset().filter(pk__in=recipe_ids)
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True,
             methods=['get'],
             permission_classes=[],
@@ -90,39 +191,38 @@ class RecipeViewSet(viewsets.ModelViewSet, RecipeActionMixin):
     @action(detail=False,
             methods=['get'],
             permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer],
             url_path='download_shopping_cart')
     def download_shopping_cart(self, request):
         user = request.user
+        renderer = request.accepted_renderer
 
         ingredients = (
-            user.cart.all()
-            .prefetch_related('recipeingredients__ingredient')
+            user.cart_totals
             .values(
-                ingredient_name=F('recipeingredients__ingredient__name'),
-                measurement_unit=F(
-                    'recipeingredients__ingredient__measurement_unit')
+                ingredient_name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+                total_amount=F('amount')
             )
-            .annotate(total_amount=Sum('recipeingredients__amount'))
             .order_by('ingredient_name')
+            .iterator()
         )
 
-        shopping_list = [
-            f"{ingredient['ingredient_name']} "
-            f"({ingredient['measurement_unit']}) — "
-            f"{ingredient['total_amount']} {ingredient['measurement_unit']}"
-            for ingredient in ingredients
-        ]
-        shopping_list_text = '\n'.join(shopping_list)
-
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename="list.txt"'
+        response = StreamingHttpResponse(
+            STREAMS[renderer.format](ingredients),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="list.{renderer.format}"'
+        )
         return response
 
 
 class CustomUserViewSet(mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
                         mixins.CreateModelMixin,
-                        viewsets.GenericViewSet):
+                        viewsets.GenericViewSet,
+                        BulkRelationMixin):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = []
@@ -164,15 +264,15 @@ class CustomUserViewSet(mixins.ListModelMixin,
     def subs_add(self, request, pk=None):
         serializer = SubscriptionSerializer(
             data=request.data,
-            context={'request': request, 'view': self}
+            context={'request': request, 'sub': self.get_object()}
         )
         serializer.is_valid(raise_exception=True)
 
         if request.method == 'POST':
+            recipes_limit = self.get_recipes_limit()
             subscription = serializer.save()
-            subscription_data = CustomUser.objects.annotate(
-                recipes_count=Count('recipes')
-            ).get(pk=subscription.pk)
+            subscription_data = CustomUser.objects.get(pk=subscription.pk)
+            self.prefetch_recipes([subscription_data], recipes_limit)
             response_serializer = CustomUserRecipesSerializer(
                 subscription_data,
                 context={'request': request}
@@ -185,16 +285,27 @@ class CustomUserViewSet(mixins.ListModelMixin,
             serializer.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False,
+            methods=('post', 'delete'),
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='subscribe')
+    def subs_bulk(self, request):
+        return self.change_relation(
+            'subs', CustomUser.objects.all(), forbidden={request.user.pk}
+        )
+
     @action(detail=False,
             methods=('get',),
             permission_classes=[permissions.IsAuthenticated],
             url_path='subscriptions')
     def subs_list(self, request):
         user = request.user
-        subscriptions = user.subs.annotate(recipes_count=Count('recipes'))
+        subscriptions = user.subs.all()
+        recipes_limit = self.get_recipes_limit()
 
-        paginator = CustomPagination()
+        paginator = SwitchablePagination()
         paginated_data = paginator.paginate_queryset(subscriptions, request)
+        self.prefetch_recipes(paginated_data, recipes_limit)
 
         serializer = CustomUserRecipesSerializer(
             paginated_data,
@@ -203,6 +314,23 @@ class CustomUserViewSet(mixins.ListModelMixin,
         )
         return paginator.get_paginated_response(serializer.data)
 
+    def get_recipes_limit(self):
+        return get_limit(self.request, 'recipes_limit', None, minimum=0)
+
+    def prefetch_recipes(self, authors, recipes_limit=None):
+        authors = list(authors)
+        if not authors:
+            return
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time'
+        )
+        if recipes_limit is not None:
+            recipes = queries.latest_per_author(
+                recipes, authors, recipes_limit
+            )
+        prefetch_related_objects(authors, Prefetch('recipes', recipes))
+
 
 class ChangePasswordViewSet(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -218,3 +346,10 @@ class ChangePasswordViewSet(views.APIView):
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DatabasePoolStatsView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(db_pool.get_stats())
@@ -0,0 +1,29 @@
+import os
+import threading
+
+from backend.db_pool.pool import ConnectionPool
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, options):
+    pool = pools.get(alias)
+    if pool is None or pool.pid != os.getpid():
+        with pools_lock:
+            pool = pools.get(alias)
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(
+                    connect,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5.0),
+                    health_check_interval=options.get(
+                        'HEALTH_CHECK_INTERVAL', 30.0),
+                    max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+                )
+                pools[alias] = pool
+    return pool
+
+
+def get_stats():
+    return {alias: pool.stats() for alias, pool in pools.items()}
@@ -0,0 +1,22 @@
+from django.db.backends.postgresql import base
+
+from backend.db_pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params=None):
+        return get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params or self.get_connection_params()
+            ),
+            self.settings_dict.get('POOL', {}),
+        )
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool(conn_params).acquire()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
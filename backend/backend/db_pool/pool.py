@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=10, timeout=5.0,
+                 health_check_interval=30.0, max_lifetime=3600.0):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'acquired': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'connect_seconds': 0.0,
+            'wait_seconds': 0.0,
+        }
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection, released_at = self._reserve(deadline)
+            if connection is None:
+                return self._open()
+            if self._is_usable(connection, released_at):
+                return connection
+            with self._condition:
+                self._counters['health_check_failures'] += 1
+            self._discard(connection)
+
+    def release(self, connection):
+        usable = not connection.closed
+        if usable:
+            try:
+                status = connection.get_transaction_status()
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                usable = False
+        expired = (
+            time.monotonic() - self._created_at.get(id(connection), 0)
+            > self.max_lifetime
+        )
+        if not usable or expired:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                **self._counters,
+            }
+
+    def _reserve(self, deadline):
+        with self._condition:
+            while True:
+                if self._idle:
+                    self._in_use += 1
+                    self._counters['acquired'] += 1
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._in_use += 1
+                    self._counters['acquired'] += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'Не удалось получить соединение с БД '
+                        f'за {self.timeout} с.'
+                    )
+                self._waiting += 1
+                self._counters['waits'] += 1
+                started = time.monotonic()
+                self._condition.wait(remaining)
+                self._counters['wait_seconds'] += time.monotonic() - started
+                self._waiting -= 1
+
+    def _open(self):
+        started = time.monotonic()
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+            self._counters['connections_opened'] += 1
+            self._counters['connect_seconds'] += time.monotonic() - started
+        return connection
+
+    def _is_usable(self, connection, released_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created_at.pop(id(connection), None)
+            self._size -= 1
+            self._in_use -= 1
+            self._counters['connections_closed'] += 1
+            self._condition.notify()
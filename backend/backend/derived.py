@@ -0,0 +1,42 @@
+from django.db import DatabaseError, router, transaction
+
+
+class DerivedFieldsMixin:
+    """Не перезаписывать производные поля при полном save().
+
+    Поля из derived_fields (счётчики и т.п.) обновляются запросами в обход
+    экземпляра, поэтому у загруженного из БД экземпляра их значения могут
+    устареть. Полный save() такого экземпляра передаёт в update_fields все
+    остальные загруженные поля. Новые экземпляры и строки, которые пропали
+    из БД и вставляются заново, сохраняются целиком, как обычно.
+    """
+
+    derived_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is not None or force_insert or self._state.adding:
+            return super().save(
+                force_insert=force_insert, force_update=force_update,
+                using=using, update_fields=update_fields
+            )
+        deferred = self.get_deferred_fields()
+        update_fields = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in self.derived_fields
+            and field.attname not in deferred
+        ]
+        using = using or router.db_for_write(type(self), instance=self)
+        try:
+            with transaction.atomic(using=using):
+                return super().save(
+                    force_update=force_update, using=using,
+                    update_fields=update_fields
+                )
+        except DatabaseError:
+            if force_update or type(self)._base_manager.using(using).filter(
+                pk=self.pk
+            ).exists():
+                raise
+        return super().save(force_insert=True, using=using)
@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from backend import db_pool
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        LATENCY_BUCKETS, 'Время обработки запроса, с.'
+    ),
+    'http_render_duration_seconds': (
+        LATENCY_BUCKETS, 'Время рендеринга ответа, с.'
+    ),
+    'http_serialize_duration_seconds': (
+        LATENCY_BUCKETS,
+        'Время работы представления без SQL-запросов (сериализация), с.'
+    ),
+    'http_response_size_bytes': (SIZE_BUCKETS, 'Размер ответа, байт.'),
+    'db_queries_per_request': (
+        QUERY_BUCKETS, 'Количество SQL-запросов на запрос.'
+    ),
+    'db_duration_seconds_per_request': (
+        LATENCY_BUCKETS, 'Время SQL-запросов на запрос, с.'
+    ),
+}
+COUNTERS = {
+    'http_responses_total': 'Количество ответов.',
+    'db_slow_queries_total': 'Количество медленных SQL-запросов.',
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._pid = None
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][0]
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [
+                    [0] * (len(buckets) + 1), 0.0
+                ]
+            histogram[0][bisect_left(buckets, value)] += 1
+            histogram[1] += value
+
+    def increment(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def dump(self):
+        with self._lock:
+            return {
+                'histograms': [
+                    [name, list(labels), list(counts), total]
+                    for (name, labels), (counts, total)
+                    in self._histograms.items()
+                ],
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                'pool': db_pool.get_stats(),
+            }
+
+    def start(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(
+            target=self.flush_periodically, name='metrics-flush', daemon=True
+        ).start()
+
+    def flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Не удалось сохранить метрики')
+
+    def flush(self):
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(
+            settings.METRICS_DIR, f'metrics-{os.getpid()}.json'
+        )
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.dump(), file)
+        os.replace(temp_path, path)
+
+
+registry = Registry()
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def collect():
+    histograms = {}
+    counters = {}
+    pools = {}
+    directory = settings.METRICS_DIR
+    for file_name in sorted(os.listdir(directory)):
+        if not (
+            file_name.startswith('metrics-') and file_name.endswith('.json')
+        ):
+            continue
+        path = os.path.join(directory, file_name)
+        pid = int(file_name[len('metrics-'):-len('.json')])
+        if not is_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, counts, total in data['histograms']:
+            merged = histograms.setdefault(
+                (name, tuple(labels)), [[0] * len(counts), 0.0]
+            )
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+        for name, labels, value in data['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for alias, stats in data['pool'].items():
+            pools[(alias, pid)] = stats
+    return histograms, counters, pools
+
+
+def format_labels(names, values):
+    return ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+        for name, value in zip(names, values)
+    )
+
+
+def render():
+    registry.flush()
+    histograms, counters, pools = collect()
+    lines = []
+    for name, (buckets, description) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            label_text = format_labels(('view', 'method'), labels)
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{name}_sum{{{label_text}}} {total}')
+            lines.append(f'{name}_count{{{label_text}}} {cumulative}')
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                label_names = (
+                    ('view', 'method', 'status')
+                    if name == 'http_responses_total' else ('view',)
+                )
+                lines.append(
+                    f'{name}{{{format_labels(label_names, labels)}}} {value}'
+                )
+    lines.append('# HELP db_pool_connections Состояние пула соединений.')
+    lines.append('# TYPE db_pool_connections gauge')
+    for (alias, pid), stats in sorted(pools.items()):
+        for state in ('size', 'in_use', 'idle', 'waiting'):
+            label_text = format_labels(
+                ('alias', 'pid', 'state'), (alias, pid, state)
+            )
+            lines.append(
+                f'db_pool_connections{{{label_text}}} {stats.get(state, 0)}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,152 @@
+import asyncio
+import atexit
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from backend.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('metrics_request', default=None)
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.db_duration = 0.0
+        self.render_duration = None
+        self.serialize_duration = None
+        self.view_started = None
+
+    @property
+    def view(self):
+        resolver_match = self.request.resolver_match
+        if resolver_match is None:
+            return 'unresolved'
+        return resolver_match.view_name
+
+
+def record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats = current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_duration += duration
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is not None and duration >= threshold:
+            view = stats.view if stats is not None else 'background'
+            registry.increment('db_slow_queries_total', (view,))
+            logger.warning(
+                'Медленный SQL-запрос (%.1f мс) в %s: %s',
+                duration * 1000, view, sql
+            )
+
+
+def install_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    if settings.METRICS_ENABLED:
+        install_wrapper(connection)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        atexit.register(registry.flush)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_wrapper(connection)
+        stats, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(stats, started, response)
+
+    async def __acall__(self, request):
+        stats, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(stats, started, response)
+
+    def start(self, request):
+        registry.start()
+        stats = RequestStats(request)
+        return stats, current.set(stats), time.perf_counter()
+
+    def finish(self, stats, started, response):
+        duration = time.perf_counter() - started
+        labels = (stats.view, stats.request.method)
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('db_queries_per_request', labels, stats.queries)
+        registry.observe(
+            'db_duration_seconds_per_request', labels, stats.db_duration
+        )
+        if stats.render_duration is not None:
+            registry.observe(
+                'http_render_duration_seconds', labels, stats.render_duration
+            )
+        if stats.serialize_duration is not None:
+            registry.observe(
+                'http_serialize_duration_seconds', labels,
+                stats.serialize_duration
+            )
+        if not response.streaming:
+            registry.observe(
+                'http_response_size_bytes', labels, len(response.content)
+            )
+        registry.increment(
+            'http_responses_total', (*labels, str(response.status_code))
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current.get()
+        if stats is not None:
+            stats.view_started = (time.perf_counter(), stats.db_duration)
+
+    def process_template_response(self, request, response):
+        stats = current.get()
+        if stats is not None:
+            started = time.perf_counter()
+            if stats.view_started is not None:
+                view_started, db_duration = stats.view_started
+                stats.serialize_duration = max(
+                    started - view_started
+                    - (stats.db_duration - db_duration),
+                    0.0
+                )
+
+            def finish(response):
+                stats.render_duration = time.perf_counter() - started
+
+            response.add_post_render_callback(finish)
+        return response
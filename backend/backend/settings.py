@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,17 +58,70 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+ASGI_APPLICATION = 'backend.asgi.application'
+
+ASYNC_VIEWS = os.getenv('SERVER_MODE', 'wsgi').lower() == 'asgi'
+
+ASYNC_ORM_THREADS = int(os.getenv('ASYNC_ORM_THREADS', 8))
+
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ['true', '1', 'yes']
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'backend.db_pool' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('CONN_MAX_AGE', 0)),
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+            'HEALTH_CHECK_INTERVAL': float(
+                os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+        },
     }
 }
 
+FRAGMENT_CACHE_BACKEND = os.getenv(
+    'FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.getenv(
+            'CATALOG_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 24 * 60 * 60)),
+    },
+    'fragments': {
+        'BACKEND': FRAGMENT_CACHE_BACKEND,
+        'LOCATION': os.getenv('FRAGMENT_CACHE_LOCATION', 'fragments'),
+        'TIMEOUT': int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 10 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 10000)),
+        } if FRAGMENT_CACHE_BACKEND.endswith('LocMemCache') else {},
+    },
+    'tokens': {
+        'BACKEND': os.getenv(
+            'TOKEN_CACHE_BACKEND',
+            'django.core.cache.backends.dummy.DummyCache'
+        ),
+        'LOCATION': os.getenv('TOKEN_CACHE_LOCATION', 'tokens'),
+        'TIMEOUT': int(os.getenv('TOKEN_CACHE_TTL', 30)),
+    },
+}
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -101,11 +155,13 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media/'
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -114,6 +170,33 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', 1))
+
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', 2))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+
+METRICS_ENABLED = os.getenv(
+    'METRICS_ENABLED', 'True'
+).lower() in ['true', '1', 'yes']
+
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/foodgram-metrics')
+
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+SLOW_QUERY_THRESHOLD = (
+    float(os.getenv('SLOW_QUERY_THRESHOLD_MS')) / 1000
+    if os.getenv('SLOW_QUERY_THRESHOLD_MS') else None
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'USER_ID_FIELD': 'id',
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from recipes import cart_totals, search
 from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
 
 
@@ -38,6 +39,12 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags',)
     inlines = [RecipeIngredientsInline]
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = cart_totals.get_amounts([form.instance.pk])
+        super().save_related(request, form, formsets, change)
+        cart_totals.update_recipe(form.instance.pk, old_amounts)
+        search.update_vectors([form.instance.pk])
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
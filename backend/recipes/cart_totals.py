@@ -0,0 +1,106 @@
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.models import RecipeIngredients, ShoppingCartTotal
+from users.models import CustomUser
+
+Cart = CustomUser.cart.through
+
+
+def get_amounts(recipe_ids):
+    return dict(
+        RecipeIngredients.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values_list('ingredient_id')
+        .annotate(Sum('amount'))
+    )
+
+
+def get_cart_users(recipe_id):
+    return list(
+        Cart.objects.filter(recipe_id=recipe_id)
+        .values_list('customuser_id', flat=True)
+    )
+
+
+def apply_changes(user_ids, changes):
+    changes = {
+        ingredient_id: amount
+        for ingredient_id, amount in sorted(changes.items()) if amount
+    }
+    user_ids = list(user_ids)
+    if not user_ids or not changes:
+        return
+    ShoppingCartTotal.objects.bulk_create(
+        [
+            ShoppingCartTotal(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, amount in changes.items() if amount > 0
+        ],
+        ignore_conflicts=True
+    )
+    ShoppingCartTotal.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=changes
+    ).update(amount=F('amount') + Case(
+        *(
+            When(ingredient_id=ingredient_id, then=Value(amount))
+            for ingredient_id, amount in changes.items()
+        ),
+        output_field=IntegerField()
+    ))
+    ShoppingCartTotal.objects.filter(
+        user_id__in=user_ids, amount__lte=0
+    ).delete()
+
+
+def add_recipes(user_ids, recipe_ids):
+    apply_changes(user_ids, get_amounts(recipe_ids))
+
+
+def remove_recipes(user_ids, recipe_ids):
+    apply_changes(user_ids, {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_amounts(recipe_ids).items()
+    })
+
+
+def update_recipe(recipe_id, old_amounts):
+    new_amounts = get_amounts([recipe_id])
+    apply_changes(get_cart_users(recipe_id), {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in new_amounts.keys() | old_amounts.keys()
+    })
+
+
+def calculate(user_ids=None):
+    if user_ids is None:
+        lookup = {'recipe__in_cart_of__isnull': False}
+    else:
+        lookup = {'recipe__in_cart_of__in': user_ids}
+    return (
+        RecipeIngredients.objects
+        .filter(**lookup)
+        .order_by()
+        .values_list('recipe__in_cart_of', 'ingredient_id')
+        .annotate(Sum('amount'))
+    )
+
+
+def rebuild(user_ids=None, batch_size=5000):
+    existing = ShoppingCartTotal.objects.all()
+    if user_ids is not None:
+        existing = existing.filter(user_id__in=user_ids)
+    existing.delete()
+
+    batch = []
+    for user_id, ingredient_id, amount in calculate(user_ids).iterator():
+        batch.append(ShoppingCartTotal(
+            user_id=user_id, ingredient_id=ingredient_id, amount=amount
+        ))
+        if len(batch) >= batch_size:
+            ShoppingCartTotal.objects.bulk_create(batch)
+            batch = []
+    ShoppingCartTotal.objects.bulk_create(batch)
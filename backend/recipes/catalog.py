@@ -0,0 +1,32 @@
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import CatalogVersion
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def bump(name):
+    updated = CatalogVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(name=name, defaults={
+            'version': 1
+        })
+
+
+def get_versions(request=None):
+    versions = getattr(request, '_catalog_versions', None)
+    if versions is None:
+        versions = {
+            name: (version, updated_at)
+            for name, version, updated_at
+            in CatalogVersion.objects.values_list(
+                'name', 'version', 'updated_at'
+            )
+        }
+        if request is not None:
+            request._catalog_versions = versions
+    return versions
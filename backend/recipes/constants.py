@@ -3,3 +3,7 @@ MAX_VALUE = 32000
 MIN_VALUE = 1
 
 TITLE_MAX_LENGTH = 256
+
+THUMBNAIL_SIZE = (480, 480)
+
+IMAGE_QUALITY = 80
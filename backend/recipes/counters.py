@@ -0,0 +1,89 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+Favorites = CustomUser.fav.through
+Cart = CustomUser.cart.through
+Subscriptions = CustomUser.subs.through
+
+RELATIONS = {
+    Favorites: (Recipe, 'favorites_count', 'customuser_id', 'recipe_id'),
+    Cart: (Recipe, 'carts_count', 'customuser_id', 'recipe_id'),
+    Subscriptions: (
+        CustomUser, 'followers_count', 'from_customuser_id', 'to_customuser_id'
+    ),
+}
+
+COUNTERS = (
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Subscriptions, 'to_customuser'),
+    (Recipe, 'favorites_count', Favorites, 'recipe'),
+    (Recipe, 'carts_count', Cart, 'recipe'),
+)
+
+
+def change(model, field, pks, delta):
+    if delta:
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def relation_changed(through, instance, action, reverse, pk_set):
+    model, field, source, target = RELATIONS[through]
+    if action == 'post_add' and pk_set:
+        if reverse:
+            change(model, field, [instance.pk], len(pk_set))
+        else:
+            change(model, field, pk_set, 1)
+
+    elif action == 'pre_remove' and pk_set:
+        if reverse:
+            change(model, field, [instance.pk], -through.objects.filter(
+                **{target: instance.pk, f'{source}__in': pk_set}
+            ).count())
+        else:
+            change(model, field, list(through.objects.filter(
+                **{source: instance.pk, f'{target}__in': pk_set}
+            ).values_list(target, flat=True)), -1)
+
+    elif action == 'pre_clear':
+        if reverse:
+            model.objects.filter(pk=instance.pk).update(**{field: 0})
+        else:
+            change(model, field, list(through.objects.filter(
+                **{source: instance.pk}
+            ).values_list(target, flat=True)), -1)
+
+
+def user_deleted(user_id):
+    for through, (model, field, source, target) in RELATIONS.items():
+        change(model, field, list(through.objects.filter(
+            **{source: user_id}
+        ).values_list(target, flat=True)), -1)
+
+
+def expected(related, column):
+    return Coalesce(
+        Subquery(
+            related.objects
+            .filter(**{column: OuterRef('pk')})
+            .order_by()
+            .values(column)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0)
+    )
+
+
+def mismatched(model, field, related, column):
+    return model.objects.annotate(
+        expected_count=expected(related, column)
+    ).exclude(**{field: F('expected_count')})
+
+
+def rebuild(model, field, related, column):
+    return model.objects.filter(
+        pk__in=mismatched(model, field, related, column).values('pk')
+    ).update(**{field: expected(related, column)})
@@ -0,0 +1,359 @@
+import csv
+import json
+import random
+from array import array
+from bisect import bisect
+from functools import lru_cache
+from io import BytesIO, StringIO
+from itertools import accumulate
+from multiprocessing import Pool
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes import cart_totals, catalog, counters, feed, images, search
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import CustomUser
+
+USERNAME_PREFIX = 'bench_user_'
+RECIPE_PREFIX = 'bench-recipe-'
+PASSWORD = 'bench-password'
+PLACEHOLDER_IMAGE = 'pics/bench-placeholder-{}.png'
+PLACEHOLDER_COLORS = (
+    (230, 180, 120),
+    (200, 90, 70),
+    (120, 170, 90),
+    (240, 210, 110),
+    (150, 110, 80),
+    (190, 200, 210),
+)
+DEFAULT_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+BATCH_SIZE = 2000
+CHUNK_SIZE = 10000
+ZIPF_EXPONENT = 1.1
+INGREDIENTS_PER_RECIPE = (3, 12)
+PHASES = ('users', 'recipes', 'relations', 'feeds', 'vectors')
+
+
+def get_placeholder_images():
+    placeholders = []
+    for index, color in enumerate(PLACEHOLDER_COLORS):
+        name = PLACEHOLDER_IMAGE.format(index)
+        if not default_storage.exists(name):
+            content = BytesIO()
+            Image.new('RGB', (640, 480), color).save(content, 'PNG')
+            default_storage.save(name, ContentFile(content.getvalue()))
+        placeholders.append((name, images.generate_variants(name)))
+    return placeholders
+
+
+def get_users():
+    return CustomUser.objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+def get_tokens(users):
+    return [Token.objects.get_or_create(user=user)[0].key for user in users]
+
+
+@lru_cache(maxsize=None)
+def get_ranking(count, exponent, key):
+    ranking = array('q', range(count))
+    random.Random(key).shuffle(ranking)
+    weights = array('d', accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+    return ranking, weights
+
+
+def choose(generator, ranking, weights, count, exclude=None):
+    count = min(count, len(ranking) - (exclude is not None))
+    chosen = set()
+    for _ in range(count * 4):
+        if len(chosen) >= count:
+            break
+        value = ranking[bisect(weights, generator.random() * weights[-1])]
+        if value != exclude:
+            chosen.add(value)
+    return sorted(chosen)
+
+
+def insert(model, fields, rows):
+    if not rows:
+        return
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, row))) for row in rows],
+            batch_size=BATCH_SIZE
+        )
+        return
+    buffer = StringIO()
+    csv.writer(buffer).writerows(
+        [
+            json.dumps(value) if isinstance(value, dict) else value
+            for value in row
+        ]
+        for row in rows
+    )
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} ({columns}) '
+            f'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def reset_sequences(models):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Dataset:
+    def __init__(self, users, recipes, random_seed=0, favorites=20,
+                 carts=5, subscriptions=20, exponent=ZIPF_EXPONENT):
+        self.users = users
+        self.recipes = recipes
+        self.random_seed = random_seed
+        self.favorites = favorites
+        self.carts = carts
+        self.subscriptions = subscriptions
+        self.exponent = exponent
+
+    def prepare(self):
+        if get_users().exists():
+            raise ValueError(
+                'Тестовые данные уже созданы, сначала удалите их.'
+            )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        if not self.ingredient_ids:
+            raise ValueError('Сначала загрузите ингредиенты.')
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                [Tag(name=name, slug=slug) for name, slug in DEFAULT_TAGS],
+                ignore_conflicts=True
+            )
+            catalog.bump(catalog.TAGS)
+        self.tag_ids = list(
+            Tag.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        self.images = get_placeholder_images()
+        self.password = make_password(PASSWORD)
+        self.created_at = timezone.now()
+        self.first_user_id = (
+            CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        self.first_recipe_id = (
+            Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        ) + 1
+        self.get_authors()
+        self.get_popular_recipes()
+        self.get_popular_ingredients()
+
+    def get_authors(self):
+        return get_ranking(
+            self.users, self.exponent, f'{self.random_seed}:authors'
+        )
+
+    def get_popular_recipes(self):
+        return get_ranking(
+            self.recipes, self.exponent, f'{self.random_seed}:recipes'
+        )
+
+    def get_popular_ingredients(self):
+        return get_ranking(
+            len(self.ingredient_ids), self.exponent,
+            f'{self.random_seed}:ingredients'
+        )
+
+    def get_random(self, phase, start):
+        return random.Random(f'{self.random_seed}:{phase}:{start}')
+
+    def get_tasks(self, phase):
+        total = self.recipes if phase in ('recipes', 'vectors') else self.users
+        return [
+            (self, phase, start, min(start + CHUNK_SIZE, total))
+            for start in range(0, total, CHUNK_SIZE)
+        ]
+
+    def create_users(self, start, stop):
+        insert(
+            CustomUser,
+            (
+                'id', 'username', 'email', 'first_name', 'last_name',
+                'password', 'is_superuser', 'is_staff', 'is_active',
+                'date_joined', 'recipes_count', 'followers_count',
+                'avatar_variants',
+            ),
+            [
+                (
+                    self.first_user_id + number,
+                    f'{USERNAME_PREFIX}{number}',
+                    f'{USERNAME_PREFIX}{number}@example.com',
+                    'Бенч', str(number), self.password,
+                    False, False, True, self.created_at, 0, 0, {},
+                )
+                for number in range(start, stop)
+            ]
+        )
+        return stop - start
+
+    def create_recipes(self, start, stop):
+        generator = self.get_random('recipes', start)
+        authors, author_weights = self.get_authors()
+        ingredients, ingredient_weights = self.get_popular_ingredients()
+        recipes = []
+        recipe_ingredients = []
+        recipe_tags = []
+        for number in range(start, stop):
+            recipe_id = self.first_recipe_id + number
+            author = choose(generator, authors, author_weights, 1)[0]
+            image, image_variants = generator.choice(self.images)
+            recipes.append((
+                recipe_id,
+                f'{RECIPE_PREFIX}{number}',
+                self.first_user_id + author,
+                image,
+                image_variants,
+                f'Тестовый рецепт номер {number}.',
+                generator.randint(5, 180),
+                self.created_at, 0, 0,
+            ))
+            for index in choose(
+                generator, ingredients, ingredient_weights,
+                generator.randint(*INGREDIENTS_PER_RECIPE)
+            ):
+                recipe_ingredients.append((
+                    recipe_id, self.ingredient_ids[index],
+                    generator.randint(1, 500),
+                ))
+            for tag_id in generator.sample(
+                self.tag_ids, generator.randint(1, len(self.tag_ids))
+            ):
+                recipe_tags.append((recipe_id, tag_id))
+        insert(
+            Recipe,
+            (
+                'id', 'name', 'author_id', 'image', 'image_variants', 'text',
+                'cooking_time', 'updated_at', 'favorites_count',
+                'carts_count',
+            ),
+            recipes
+        )
+        insert(
+            RecipeIngredients,
+            ('recipe_id', 'ingredient_id', 'amount'),
+            recipe_ingredients
+        )
+        insert(Recipe.tags.through, ('recipe_id', 'tag_id'), recipe_tags)
+        return len(recipes) + len(recipe_ingredients) + len(recipe_tags)
+
+    def create_relations(self, start, stop):
+        generator = self.get_random('relations', start)
+        recipes, recipe_weights = self.get_popular_recipes()
+        authors, author_weights = self.get_authors()
+        favorites = []
+        carts = []
+        subscriptions = []
+        for number in range(start, stop):
+            user_id = self.first_user_id + number
+            for rows, average in ((favorites, self.favorites),
+                                  (carts, self.carts)):
+                rows.extend(
+                    (user_id, self.first_recipe_id + index)
+                    for index in choose(
+                        generator, recipes, recipe_weights,
+                        generator.randint(0, 2 * average)
+                    )
+                )
+            subscriptions.extend(
+                (user_id, self.first_user_id + index)
+                for index in choose(
+                    generator, authors, author_weights,
+                    generator.randint(0, 2 * self.subscriptions),
+                    exclude=number
+                )
+            )
+        insert(counters.Favorites, ('customuser_id', 'recipe_id'), favorites)
+        insert(counters.Cart, ('customuser_id', 'recipe_id'), carts)
+        insert(
+            counters.Subscriptions,
+            ('from_customuser_id', 'to_customuser_id'),
+            subscriptions
+        )
+        return len(favorites) + len(carts) + len(subscriptions)
+
+    def fill_feeds(self, start, stop):
+        return feed.backfill(
+            counters.Subscriptions.objects.filter(
+                from_customuser_id__gte=self.first_user_id + start,
+                from_customuser_id__lt=self.first_user_id + stop,
+            ).values_list('from_customuser_id', 'to_customuser_id')
+        )
+
+    def update_vectors(self, start, stop):
+        search.update_vectors(range(
+            self.first_recipe_id + start, self.first_recipe_id + stop
+        ))
+        return stop - start
+
+
+def init_worker():
+    django.setup()
+
+
+def run_task(task):
+    dataset, phase, start, stop = task
+    method = {
+        'users': dataset.create_users,
+        'recipes': dataset.create_recipes,
+        'relations': dataset.create_relations,
+        'feeds': dataset.fill_feeds,
+        'vectors': dataset.update_vectors,
+    }[phase]
+    with transaction.atomic():
+        return phase, method(start, stop)
+
+
+def run_tasks(tasks, workers):
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(run_task, tasks)
+        return
+    connections.close_all()
+    with Pool(workers, initializer=init_worker) as pool:
+        yield from pool.imap_unordered(run_task, tasks)
+
+
+def generate(dataset, workers=1):
+    if connection.vendor == 'sqlite':
+        workers = 1
+    dataset.prepare()
+    for phase in PHASES:
+        if phase == 'vectors' and not search.is_supported():
+            continue
+        yield phase, 0
+        yield from run_tasks(dataset.get_tasks(phase), workers)
+        if phase == 'recipes':
+            reset_sequences([CustomUser, Recipe])
+        if phase == 'relations':
+            for model, field, related, column in counters.COUNTERS:
+                counters.rebuild(model, field, related, column)
+            cart_totals.rebuild()
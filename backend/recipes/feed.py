@@ -0,0 +1,185 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from recipes import queries
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+Subscriptions = CustomUser.subs.through
+
+BATCH_SIZE = 5000
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.FEED_WORKERS, thread_name_prefix='feed'
+)
+pending = set()
+
+
+def get_regular_authors(author_ids):
+    return CustomUser.objects.filter(
+        pk__in=author_ids, followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values('pk')
+
+
+def get_latest_recipes(author_ids):
+    latest = {}
+    for author_id, recipe_id in queries.latest_per_author(
+        Recipe.objects.all(), get_regular_authors(author_ids),
+        settings.FEED_BACKFILL_SIZE
+    ).values_list('author_id', 'id'):
+        latest.setdefault(author_id, []).append(recipe_id)
+    return latest
+
+
+def backfill(subscriptions):
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return 0
+    latest = get_latest_recipes({
+        author_id for _, author_id in subscriptions
+    })
+    entries = [
+        FeedEntry(user_id=user_id, recipe_id=recipe_id)
+        for user_id, author_id in subscriptions
+        for recipe_id in latest.get(author_id, ())
+    ]
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    return len(entries)
+
+
+def remove(user_ids=None, author_ids=None):
+    entries = FeedEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    if author_ids is not None:
+        entries = entries.filter(recipe__author_id__in=author_ids)
+    entries.delete()
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    FeedEntry.objects.all().delete()
+    created = 0
+    batch = []
+    for subscription in Subscriptions.objects.order_by('pk').values_list(
+        'from_customuser_id', 'to_customuser_id'
+    ).iterator():
+        batch.append(subscription)
+        if len(batch) >= batch_size:
+            created += backfill(batch)
+            batch = []
+    return created + backfill(batch)
+
+
+def add_to_followers(recipe_id, author_id):
+    follower_ids = Subscriptions.objects.filter(
+        to_customuser_id=author_id
+    ).values_list('from_customuser_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id in follower_ids.iterator()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.filter(
+        pk=recipe_id,
+        author__followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values('author_id').first()
+    if recipe is not None:
+        add_to_followers(recipe_id, recipe['author_id'])
+
+
+def backfill_followers(author_id, batch_size=BATCH_SIZE):
+    follower_ids = Subscriptions.objects.filter(
+        to_customuser_id=author_id
+    ).order_by('pk').values_list('from_customuser_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append((user_id, author_id))
+        if len(batch) >= batch_size:
+            backfill(batch)
+            batch = []
+    backfill(batch)
+
+
+def redistribute(recipe_id, author_id):
+    FeedEntry.objects.filter(recipe_id=recipe_id).delete()
+    if get_regular_authors([author_id]).exists():
+        add_to_followers(recipe_id, author_id)
+
+
+def get_crossings(author_ids, delta):
+    limit = settings.FEED_FANOUT_LIMIT
+    counts = CustomUser.objects.filter(pk__in=author_ids).values_list(
+        'pk', 'followers_count'
+    )
+    if delta > 0:
+        return [pk for pk, count in counts if count - delta < limit <= count]
+    return [pk for pk, count in counts if count < limit <= count - delta]
+
+
+def followers_changed(author_ids, delta):
+    for author_id in get_crossings(author_ids, delta):
+        if delta > 0:
+            schedule(remove, None, [author_id])
+        else:
+            schedule(backfill_followers, author_id)
+
+
+def _run(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception(
+            'Не удалось обновить ленты: %s%r', function.__name__, args
+        )
+    finally:
+        close_old_connections()
+
+
+def submit(function, *args):
+    future = executor.submit(_run, function, *args)
+    pending.add(future)
+    future.add_done_callback(pending.discard)
+    return future
+
+
+def schedule(function, *args):
+    transaction.on_commit(lambda: submit(function, *args))
+
+
+def wait_pending():
+    while pending:
+        wait(list(pending))
+
+
+def get_recipe_ids(user, limit, before=None):
+    entries = FeedEntry.objects.filter(user=user)
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+    recipe_ids = set(
+        entries.order_by('-recipe_id')
+        .values_list('recipe_id', flat=True)[:limit + 1]
+    )
+    popular_authors = list(user.subs.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).values_list('pk', flat=True))
+    if popular_authors:
+        recipes = Recipe.objects.filter(author_id__in=popular_authors)
+        if before is not None:
+            recipes = recipes.filter(pk__lt=before)
+        recipe_ids.update(
+            recipes.order_by('-pk').values_list('pk', flat=True)[:limit + 1]
+        )
+    return sorted(recipe_ids, reverse=True)[:limit + 1]
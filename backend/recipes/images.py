@@ -0,0 +1,134 @@
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from recipes.constants import IMAGE_QUALITY, THUMBNAIL_SIZE
+from recipes.models import Recipe
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+THUMB = 'thumb'
+WEBP = 'webp'
+SOURCE = 'source'
+
+FORMATS = {THUMB: 'WEBP', WEBP: 'WEBP'}
+IMAGE_FIELDS = ((Recipe, 'image'), (CustomUser, 'avatar'))
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+)
+pending = set()
+pending_lock = threading.Lock()
+
+
+def get_variant_name(name, variant):
+    root, _ = posixpath.splitext(name)
+    if variant == THUMB:
+        return f'{root}.thumb.webp'
+    return f'{root}.{variant}'
+
+
+def generate_variants(name, storage=default_storage):
+    variants = {SOURCE: name}
+    missing = {}
+    for variant, file_format in FORMATS.items():
+        variant_name = get_variant_name(name, variant)
+        if storage.exists(variant_name):
+            variants[variant] = variant_name
+        else:
+            missing[variant] = file_format
+    if not missing:
+        return variants
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    for variant, file_format in missing.items():
+        variant_image = image
+        if variant == THUMB:
+            variant_image = image.copy()
+            variant_image.thumbnail(THUMBNAIL_SIZE)
+        content = BytesIO()
+        variant_image.save(content, file_format, quality=IMAGE_QUALITY)
+        variants[variant] = storage.save(
+            get_variant_name(name, variant), ContentFile(content.getvalue())
+        )
+    return variants
+
+
+def needs_variants(instance, field):
+    image = getattr(instance, field)
+    variants = getattr(instance, f'{field}_variants') or {}
+    return bool(image and image.name) and variants.get(SOURCE) != image.name
+
+
+def record_variants(model, pks, field, name, variants):
+    model.objects.filter(pk__in=pks, **{field: name}).update(
+        **{f'{field}_variants': variants}
+    )
+
+
+def update_variants(model, pk, field, name):
+    record_variants(model, [pk], field, name, generate_variants(name))
+
+
+def _generate_variants(key):
+    try:
+        update_variants(*key)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', key[-1])
+    finally:
+        with pending_lock:
+            pending.discard(key)
+
+
+def _submit(key):
+    with pending_lock:
+        if key in pending:
+            return
+        pending.add(key)
+    executor.submit(_generate_variants, key)
+
+
+def schedule_variants(instance, field):
+    key = (type(instance), instance.pk, field, getattr(instance, field).name)
+    transaction.on_commit(lambda: _submit(key))
+
+
+def get_variant_url(image, variant):
+    variants = getattr(image.instance, f'{image.field.name}_variants', None)
+    if (
+        not variants or variants.get(SOURCE) != image.name
+        or variant not in variants
+    ):
+        return None
+    return image.storage.url(variants[variant])
+
+
+def is_same_content(image, upload):
+    if not image or not image.name or upload is None:
+        return False
+    try:
+        if image.size != upload.size:
+            return False
+        with image.storage.open(image.name) as stored:
+            upload.seek(0)
+            for chunk in stored.chunks():
+                if upload.read(len(chunk)) != chunk:
+                    return False
+            return not upload.read(1)
+    except OSError:
+        return False
+    finally:
+        upload.seek(0)
@@ -0,0 +1,97 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import fake_data
+
+PHASE_NAMES = {
+    'users': 'пользователи',
+    'recipes': 'рецепты',
+    'relations': 'избранное, покупки и подписки',
+    'feeds': 'ленты подписок',
+    'vectors': 'поисковые векторы',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический набор данных для нагрузочного тестирования: '
+        'популярность авторов и рецептов распределена по закону Ципфа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Среднее число рецептов в избранном у пользователя.',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Среднее число рецептов в списке покупок у пользователя.',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=20,
+            help='Среднее число подписок у пользователя.',
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=fake_data.ZIPF_EXPONENT,
+            help='Показатель распределения популярности.',
+        )
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов. На SQLite всегда один.',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+        dataset = fake_data.Dataset(
+            options['users'],
+            options['recipes'],
+            random_seed=options['random_seed'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            exponent=options['zipf'],
+        )
+        started = time.monotonic()
+        phase_started = started
+        current = None
+        rows = 0
+        try:
+            for phase, created in fake_data.generate(
+                dataset, options['workers']
+            ):
+                if phase != current:
+                    if current:
+                        self.report(current, rows, phase_started)
+                    current, rows = phase, 0
+                    phase_started = time.monotonic()
+                rows += created
+        except ValueError as error:
+            raise CommandError(error)
+        if current:
+            self.report(current, rows, phase_started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def report(self, phase, rows, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{PHASE_NAMES[phase]}: {rows} строк за {elapsed:.1f} с, '
+            f'{rows / max(elapsed, 1e-9):.0f} строк/с.'
+        )
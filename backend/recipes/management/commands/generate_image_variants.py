@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from recipes import images
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры и WebP-версии загруженных изображений.'
+
+    def get_missing(self, model, field):
+        missing = {}
+        rows = model.objects.exclude(**{field: ''}).exclude(
+            **{f'{field}__isnull': True}
+        ).order_by('pk').values_list('pk', field, f'{field}_variants')
+        for pk, name, variants in rows.iterator():
+            if (variants or {}).get(images.SOURCE) != name:
+                missing.setdefault(name, []).append(pk)
+        return missing
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        for model, field in images.IMAGE_FIELDS:
+            missing = self.get_missing(model, field)
+            futures = {
+                name: images.executor.submit(images.generate_variants, name)
+                for name in missing
+            }
+            for name, future in futures.items():
+                try:
+                    variants = future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(str(error))
+                    continue
+                pks = missing[name]
+                for start in range(0, len(pks), BATCH_SIZE):
+                    images.record_variants(
+                        model, pks[start:start + BATCH_SIZE], field, name,
+                        variants
+                    )
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}, ошибок: {failed}.'
+        ))
@@ -0,0 +1,144 @@
+import csv
+import json
+import re
+import time
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import catalog
+from recipes.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if any(cell.strip() for cell in row):
+            yield dict(zip(('name', 'measurement_unit'), row))
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    opened = False
+    for chunk in iter(partial(file.read, CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидался JSON-массив объектов.')
+                opened = True
+                position += 1
+            elif buffer[position] == ',':
+                position += 1
+            elif buffer[position] == ']':
+                return
+            else:
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break
+                yield item
+    raise CommandError('Неожиданный конец JSON-файла.')
+
+
+def get_fields(record):
+    if not isinstance(record, dict):
+        return None
+    fields = []
+    for name in ('name', 'measurement_unit'):
+        value = record.get(name)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        fields.append(value.strip())
+    return fields
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV, JSON или NDJSON файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+        )
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def save(self, batch):
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or FORMATS.get(path.suffix.lower())
+        if file_format is None:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+
+        count_before = Ingredient.objects.count()
+        processed = skipped = 0
+        started = time.monotonic()
+        with path.open(encoding='utf-8', newline='') as file:
+            batch = []
+            for number, record in enumerate(READERS[file_format](file), 1):
+                fields = get_fields(record)
+                if fields is None:
+                    skipped += 1
+                    self.stderr.write(
+                        f'Запись {number} пропущена: нужны непустые '
+                        f'name и measurement_unit.'
+                    )
+                    continue
+                name, measurement_unit = fields
+                batch.append(
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                )
+                if len(batch) >= options['batch_size']:
+                    processed += self.save(batch)
+            processed += self.save(batch)
+        elapsed = time.monotonic() - started
+        catalog.bump(catalog.INGREDIENTS)
+
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, добавлено: {created}, '
+            f'пропущено: {skipped}, '
+            f'{processed / max(elapsed, 1e-9):.0f} строк/с.'
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import cart_totals
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет итоги списков покупок с корзинами пользователей '
+        'и пересобирает их.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить, без изменения данных.',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user']
+        expected = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in cart_totals.calculate(user_ids).iterator()
+        }
+        actual = ShoppingCartTotal.objects.all()
+        if user_ids is not None:
+            actual = actual.filter(user_id__in=user_ids)
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in actual.values_list('user_id', 'ingredient_id', 'amount')
+            .iterator()
+        }
+        mismatches = sum(
+            expected.get(key) != actual.get(key)
+            for key in expected.keys() | actual.keys()
+        )
+        self.stdout.write(f'Расхождений: {mismatches}.')
+
+        if mismatches and not options['check']:
+            with transaction.atomic():
+                cart_totals.rebuild(user_ids)
+            self.stdout.write(self.style.SUCCESS('Итоги пересобраны.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики рецептов, подписчиков, избранного и списков '
+        'покупок с данными и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить, без изменения данных.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, related, column in counters.COUNTERS:
+            mismatches = counters.mismatched(
+                model, field, related, column
+            ).count()
+            total += mismatches
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'расхождений {mismatches}.'
+            )
+            if mismatches and not options['check']:
+                with transaction.atomic():
+                    counters.rebuild(model, field, related, column)
+        if total and not options['check']:
+            self.stdout.write(self.style.SUCCESS('Счётчики пересобраны.'))
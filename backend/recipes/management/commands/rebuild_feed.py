@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из подписок и последних рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=feed.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = feed.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {created}.'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes import search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(
+                'Полнотекстовый поиск доступен только на PostgreSQL.'
+            )
+            return
+        batch_size = options['batch_size']
+        last_pk = 0
+        updated = 0
+        while True:
+            recipe_ids = list(
+                Recipe.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not recipe_ids:
+                break
+            search.update_vectors(recipe_ids)
+            updated += len(recipe_ids)
+            last_pk = recipe_ids[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'
+        ))
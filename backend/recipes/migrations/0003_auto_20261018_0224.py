@@ -0,0 +1,119 @@
+# Generated by Django 3.2.9 on 2026-10-18 02:24
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def get_duplicates(queryset, *fields):
+    return (
+        queryset.order_by().values(*fields)
+        .annotate(keep=Min('pk'), count=Count('pk'))
+        .filter(count__gt=1)
+    )
+
+
+def rename_duplicates(model, field='name'):
+    max_length = model._meta.get_field(field).max_length
+    for group in get_duplicates(model.objects.all(), field):
+        for instance in model.objects.filter(
+            **{field: group[field]}
+        ).exclude(pk=group['keep']):
+            suffix = f' ({instance.pk})'
+            setattr(
+                instance, field,
+                group[field][:max_length - len(suffix)] + suffix
+            )
+            instance.save(update_fields=[field])
+
+
+def remove_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    Tag = apps.get_model('recipes', 'Tag')
+
+    for group in get_duplicates(
+        Ingredient.objects.all(), 'name', 'measurement_unit'
+    ):
+        duplicates = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(pk=group['keep'])
+        RecipeIngredients.objects.filter(
+            ingredient__in=duplicates
+        ).update(ingredient_id=group['keep'])
+        duplicates.delete()
+
+    for group in RecipeIngredients.objects.order_by().values(
+        'recipe', 'ingredient'
+    ).annotate(
+        keep=Min('pk'), count=Count('pk'), total=Sum('amount')
+    ).filter(count__gt=1):
+        RecipeIngredients.objects.filter(pk=group['keep']).update(
+            amount=group['total']
+        )
+        RecipeIngredients.objects.filter(
+            recipe=group['recipe'], ingredient=group['ingredient']
+        ).exclude(pk=group['keep']).delete()
+
+    for model in (Ingredient, Tag, Recipe):
+        rename_duplicates(model)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={'ordering': ('pk',), 'verbose_name': 'ингредиент', 'verbose_name_plural': 'Ингредиенты'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pk',), 'verbose_name': 'рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipeingredients',
+            options={'ordering': ('pk',), 'verbose_name': 'ингредиенты рецепта', 'verbose_name_plural': 'Ингредиенты рецептов'},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ('pk',), 'verbose_name': 'тег', 'verbose_name_plural': 'Теги'},
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=256, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='cooking_time',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(32000)], verbose_name='Время приготовления'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(max_length=256, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredients',
+            name='amount',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(32000)], verbose_name='Количество'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=256, unique=True, verbose_name='Название'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipeingredients',
+            unique_together={('recipe', 'ingredient')},
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.9 on 2026-10-18 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Subscriptions = CustomUser.subs.through
+    authors = CustomUser.objects.filter(
+        followers__isnull=False,
+        followers_count__lt=settings.FEED_FANOUT_LIMIT,
+    ).distinct().values_list('pk', flat=True)
+    for author_id in authors.iterator():
+        recipe_ids = list(
+            Recipe.objects.filter(author_id=author_id)
+            .order_by('-id')
+            .values_list('pk', flat=True)[:settings.FEED_BACKFILL_SIZE]
+        )
+        follower_ids = Subscriptions.objects.filter(
+            to_customuser_id=author_id
+        ).values_list('from_customuser_id', flat=True)
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=user_id, recipe_id=recipe_id)
+                for user_id in follower_ids
+                for recipe_id in recipe_ids
+            ],
+            batch_size=5000,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_search_vector'),
+        ('users', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+                'ordering': ('pk',),
+                'unique_together': {('user', 'recipe')},
+            },
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
+from backend.derived import DerivedFieldsMixin
 from recipes.constants import TITLE_MAX_LENGTH, MAX_VALUE, MIN_VALUE
 from users.models import CustomUser
 
@@ -40,7 +42,11 @@ class Ingredient(AbstractModel):
         ordering = ('pk',)
 
 
-class Recipe(AbstractModel):
+class Recipe(DerivedFieldsMixin, AbstractModel):
+    derived_fields = (
+        'favorites_count', 'carts_count', 'search_vector', 'image_variants'
+    )
+
     author = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
@@ -48,6 +54,9 @@ class Recipe(AbstractModel):
         related_name='recipes'
     )
     image = models.ImageField('Картинка', upload_to='pics')
+    image_variants = models.JSONField(
+        'Версии картинки', default=dict, editable=False
+    )
     text = models.TextField('Текстовое описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -68,11 +77,24 @@ class Recipe(AbstractModel):
             MaxValueValidator(MAX_VALUE)
         ),
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pk',)
+        indexes = (
+            models.Index(
+                fields=('author', '-id'), name='recipe_author_id_desc_idx'
+            ),
+        )
 
 
 class RecipeIngredients(models.Model):
@@ -101,3 +123,66 @@ class RecipeIngredients(models.Model):
         verbose_name_plural = 'Ингредиенты рецептов'
         unique_together = ('recipe', 'ingredient')
         ordering = ('pk',)
+        indexes = (
+            models.Index(
+                fields=('ingredient', 'recipe'),
+                name='recipeingr_ingr_recipe_idx'
+            ),
+        )
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='cart_totals'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='cart_totals'
+    )
+    amount = models.IntegerField('Количество', default=0)
+
+    class Meta:
+        verbose_name = 'итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        unique_together = ('user', 'ingredient')
+        ordering = ('pk',)
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        unique_together = ('user', 'recipe')
+        ordering = ('pk',)
+
+
+class CatalogVersion(models.Model):
+    name = models.CharField('Справочник', max_length=32, primary_key=True)
+    version = models.PositiveBigIntegerField('Версия', default=0)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'версия справочника'
+        verbose_name_plural = 'Версии справочников'
+        ordering = ('pk',)
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
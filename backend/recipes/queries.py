@@ -0,0 +1,22 @@
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe
+
+
+def latest_per_author(recipes, authors, limit):
+    """Оставить в recipes не больше limit последних рецептов каждого автора."""
+    ranked = Recipe.objects.filter(author__in=authors).annotate(
+        author_position=Window(
+            expression=RowNumber(),
+            partition_by=F('author'),
+            order_by=F('id').desc()
+        )
+    ).values('id', 'author_position')
+    sql, params = ranked.query.sql_with_params()
+    return recipes.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.author_position <= %s',
+        (*params, limit)
+    ))
@@ -0,0 +1,106 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, TextField
+
+from recipes.models import Recipe, RecipeIngredients
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.SEARCH_WORKERS, thread_name_prefix='search'
+)
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def build_vector():
+    ingredient_names = Subquery(
+        RecipeIngredients.objects
+        .filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', delimiter=' '))
+        .values('names'),
+        output_field=TextField()
+    )
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector(
+            ingredient_names, weight='B', config=settings.SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=settings.SEARCH_CONFIG)
+    )
+
+
+def update_vectors(recipe_ids):
+    if is_supported():
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=build_vector()
+        )
+
+
+def update_vectors_in_batches(recipe_ids, batch_size=BATCH_SIZE):
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), batch_size):
+        update_vectors(recipe_ids[start:start + batch_size])
+
+
+def update_ingredient_vectors(ingredient_id, batch_size=BATCH_SIZE):
+    last_pk = 0
+    while True:
+        recipe_ids = list(
+            RecipeIngredients.objects.filter(
+                ingredient_id=ingredient_id, recipe_id__gt=last_pk
+            )
+            .order_by('recipe_id')
+            .values_list('recipe_id', flat=True)[:batch_size]
+        )
+        if not recipe_ids:
+            return
+        update_vectors(recipe_ids)
+        last_pk = recipe_ids[-1]
+
+
+def _run(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Не удалось обновить поисковые векторы')
+    finally:
+        close_old_connections()
+
+
+def schedule(function, *args):
+    if is_supported():
+        transaction.on_commit(lambda: executor.submit(_run, function, *args))
+
+
+def search_recipes(queryset, value):
+    if is_supported():
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pk')
+    return search_recipes_by_substring(queryset, value)
+
+
+def search_recipes_by_substring(queryset, value):
+    return queryset.filter(
+        Q(name__icontains=value)
+        | Q(text__icontains=value)
+        | Q(Exists(RecipeIngredients.objects.filter(
+            recipe=OuterRef('pk'), ingredient__name__icontains=value
+        )))
+    )
@@ -0,0 +1,163 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes import cart_totals, catalog, counters, feed, images, search
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCartTotal, Tag)
+from users.models import CustomUser
+
+
+@receiver(m2m_changed, sender=cart_totals.Cart)
+def update_cart_totals(instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            cart_totals.add_recipes(pk_set, [instance.pk])
+        else:
+            cart_totals.add_recipes([instance.pk], pk_set)
+
+    elif action == 'pre_remove':
+        if reverse:
+            cart_totals.remove_recipes(
+                cart_totals.Cart.objects.filter(
+                    recipe_id=instance.pk, customuser_id__in=pk_set
+                ).values_list('customuser_id', flat=True),
+                [instance.pk]
+            )
+        else:
+            cart_totals.remove_recipes(
+                [instance.pk],
+                cart_totals.Cart.objects.filter(
+                    customuser_id=instance.pk, recipe_id__in=pk_set
+                ).values_list('recipe_id', flat=True)
+            )
+
+    elif action == 'pre_clear':
+        if reverse:
+            cart_totals.remove_recipes(
+                cart_totals.get_cart_users(instance.pk), [instance.pk]
+            )
+        else:
+            ShoppingCartTotal.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=counters.Favorites)
+@receiver(m2m_changed, sender=counters.Cart)
+@receiver(m2m_changed, sender=counters.Subscriptions)
+def update_relation_counters(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    counters.relation_changed(sender, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=counters.Subscriptions)
+def update_feeds(instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            feed.backfill((user_id, instance.pk) for user_id in pk_set)
+            feed.followers_changed([instance.pk], len(pk_set))
+        else:
+            feed.backfill((instance.pk, author_id) for author_id in pk_set)
+            feed.followers_changed(pk_set, 1)
+
+    elif action == 'post_remove':
+        if reverse:
+            feed.remove(user_ids=pk_set, author_ids=[instance.pk])
+            feed.followers_changed([instance.pk], -len(pk_set))
+        else:
+            feed.remove(user_ids=[instance.pk], author_ids=pk_set)
+            feed.followers_changed(pk_set, -1)
+
+    elif action == 'pre_clear':
+        if reverse:
+            feed.remove(author_ids=[instance.pk])
+        else:
+            feed.followers_changed(
+                list(instance.subs.values_list('pk', flat=True)), -1
+            )
+            feed.remove(user_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=Recipe)
+def move_recipe_to_new_author(instance, update_fields, **kwargs):
+    if instance._state.adding or (
+        update_fields is not None and 'author' not in update_fields
+    ):
+        return
+    old_author_id = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list('author_id', flat=True).first()
+    if old_author_id is not None and old_author_id != instance.author_id:
+        counters.change(CustomUser, 'recipes_count', [old_author_id], -1)
+        counters.change(CustomUser, 'recipes_count', [instance.author_id], 1)
+        feed.schedule(
+            feed.redistribute, instance.pk, instance.author_id
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        counters.change(CustomUser, 'recipes_count', [instance.author_id], 1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        feed.schedule(feed.fan_out, instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    counters.change(CustomUser, 'recipes_count', [instance.author_id], -1)
+
+
+@receiver(pre_delete, sender=CustomUser)
+def decrement_deleted_user_counters(instance, **kwargs):
+    counters.user_deleted(instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_cart_totals(instance, **kwargs):
+    cart_totals.remove_recipes(
+        cart_totals.get_cart_users(instance.pk), [instance.pk]
+    )
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    catalog.bump(catalog.TAGS)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    catalog.bump(catalog.INGREDIENTS)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(instance, created, update_fields,
+                                     **kwargs):
+    if not created and (update_fields is None or 'name' in update_fields):
+        search.schedule(search.update_ingredient_vectors, instance.pk)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def update_search_vectors_after_ingredient_delete(instance, **kwargs):
+    recipe_ids = list(
+        RecipeIngredients.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)
+    )
+    if recipe_ids:
+        search.schedule(search.update_vectors_in_batches, recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(instance, **kwargs):
+    if images.needs_variants(instance, 'image'):
+        images.schedule_variants(instance, 'image')
+
+
+@receiver(post_save, sender=CustomUser)
+def process_avatar(instance, **kwargs):
+    if images.needs_variants(instance, 'avatar'):
+        images.schedule_variants(instance, 'avatar')
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.9 on 2026-10-18 02:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20250112_1415'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customuser',
+            options={'ordering': ('pk',), 'verbose_name': 'пользователь', 'verbose_name_plural': 'Пользователи'},
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX customuser_fav_recipe_user_idx '
+            'ON users_customuser_fav (recipe_id, customuser_id);',
+            'DROP INDEX customuser_fav_recipe_user_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX customuser_cart_recipe_user_idx '
+            'ON users_customuser_cart (recipe_id, customuser_id);',
+            'DROP INDEX customuser_cart_recipe_user_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX customuser_subs_to_from_idx '
+            'ON users_customuser_subs (to_customuser_id, from_customuser_id);',
+            'DROP INDEX customuser_subs_to_from_idx;',
+        ),
+    ]
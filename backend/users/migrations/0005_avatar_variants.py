@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Версии аватарки'),
+        ),
+    ]
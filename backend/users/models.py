@@ -1,8 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from backend.derived import DerivedFieldsMixin
+
+
+class CustomUser(DerivedFieldsMixin, AbstractUser):
+    derived_fields = ('recipes_count', 'followers_count', 'avatar_variants')
 
-class CustomUser(AbstractUser):
     email = models.EmailField(
         'Адрес электронной почты',
         unique=True,
@@ -15,6 +19,9 @@ class CustomUser(AbstractUser):
         blank=True,
         null=True,
     )
+    avatar_variants = models.JSONField(
+        'Версии аватарки', default=dict, editable=False
+    )
     subs = models.ManyToManyField(
         'self',
         symmetrical=False,
@@ -34,6 +41,12 @@ class CustomUser(AbstractUser):
         verbose_name='Список покупок',
         blank=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'пользователь'